@@ -0,0 +1,42 @@
+# bench 腳本共用：設定 bot.py import 時需要的環境變數，再載入 bot 模組
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_bot(**env: str):
+    os.environ.setdefault("DISCORD_TOKEN", "bench-token")
+    os.environ.setdefault("CHANNEL_ID", "1")
+    os.environ.setdefault("SLEEP_CHANNEL_ID", "2")
+    os.environ.setdefault("CRYPTO_ALERT_CHANNEL_ID", "3")
+    os.environ.setdefault("STATE_PERSIST_ENABLED", "0")
+    os.environ.update(env)
+
+    sys.path.insert(0, ROOT)
+    import bot
+    return bot
+
+
+class NullChannel:
+    id = 0
+
+    async def send(self, content, **kwargs):
+        return None
+
+
+def discard_alerts(bot):
+    # 提醒直接丟掉：只量評估本身，不受發送佇列的速率限制影響
+    async def submit(channel, alerts):
+        return None
+
+    bot.alert_dispatcher.submit = submit
+
+
+def report(name: str, runs: int, elapsed: float, unit: str = "pass"):
+    print(f"{name}: {runs} x {unit} in {elapsed:.2f}s -> {elapsed / runs * 1e3:.3f} ms/{unit}", flush=True)
+
+
+def timed():
+    return time.perf_counter()
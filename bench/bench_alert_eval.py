@@ -0,0 +1,40 @@
+# 500 個幣種的向量化提醒評估：每輪約 10% 幣種有新報價
+# 用法：python bench/bench_alert_eval.py [symbols] [passes]
+import asyncio
+import datetime
+import random
+import sys
+
+from _common import NullChannel, discard_alerts, load_bot, report, timed
+
+SYMBOLS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+PASSES = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+
+names = [f"C{i}" for i in range(SYMBOLS)]
+bot = load_bot(
+    CRYPTO_SYMBOLS=",".join(names),
+    CRYPTO_BREAKOUT_STEPS=",".join(f"{name}:10" for name in names),
+)
+discard_alerts(bot)
+
+
+async def main():
+    rng = random.Random(1)
+    channel = NullChannel()
+    start_dt = datetime.datetime(2026, 1, 1, tzinfo=bot.TZ)
+    prices = {name: 100.0 + i for i, name in enumerate(names)}
+
+    # 先填滿 1h 視窗，量的是穩定狀態
+    for k in range(3600 // 2):
+        await bot.process_price_batch(channel, start_dt + datetime.timedelta(seconds=2 * k), prices)
+
+    movers = max(1, SYMBOLS // 10)
+    start = timed()
+    for k in range(PASSES):
+        for name in rng.sample(names, movers):
+            prices[name] *= rng.uniform(0.999, 1.001)
+        await bot.process_price_batch(channel, start_dt + datetime.timedelta(seconds=3600 + k), prices)
+    report(f"process_price_batch x {SYMBOLS} symbols", PASSES, timed() - start)
+
+
+asyncio.run(main())
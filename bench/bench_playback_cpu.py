@@ -0,0 +1,95 @@
+# 每條播放串流的 CPU：PCM 路徑（FFmpeg 解碼 + discord.py 編 Opus）vs FFmpeg 轉 Opus vs Opus 直接 copy
+# 用法：python bench/bench_playback_cpu.py [秒數] [串流數]
+# 需要 PATH 上有 ffmpeg（或用 FFMPEG 環境變數指定）；discord.py 找不到 libopus 時，PCM 路徑只算得到 FFmpeg 那一半
+import asyncio
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import load_bot
+
+SECONDS = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+STREAMS = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+FFMPEG = os.getenv("FFMPEG", "ffmpeg")
+
+if not shutil.which(FFMPEG):
+    sys.exit(f"找不到 ffmpeg：{FFMPEG}")
+
+bot = load_bot()
+discord = bot.discord
+
+# 本機檔案沒有 reconnect 可言，只保留輸出選項（copy 時 ffmpeg 會警告 -b:a 沒用到，可以忽略）
+FFMPEG_OPTIONS = {"executable": FFMPEG, "options": bot.FFMPEG_OPTIONS["options"]}
+
+workdir = tempfile.mkdtemp(prefix="bench-playback-")
+sample = os.path.join(workdir, "sample.webm")
+subprocess.run(
+    [
+        FFMPEG, "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={SECONDS}",
+        "-ac", "2", "-c:a", "libopus", "-b:a", "128k", sample,
+    ],
+    check=True,
+)
+
+encoder = None
+if discord.opus.is_loaded() or discord.opus._load_default():
+    encoder = discord.opus.Encoder()
+
+
+def children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+async def run_path(mode: str, codec: str | None) -> tuple[float, float, int]:
+    bot.AUDIO_PLAYBACK_MODE = mode
+    ffmpeg_before = children_cpu()
+    python_cpu = 0.0
+    frames = 0
+
+    for _ in range(STREAMS):
+        source = await bot.build_audio_source(sample, codec, **FFMPEG_OPTIONS)
+        try:
+            while True:
+                frame = source.read()
+                if not frame:
+                    break
+                frames += 1
+                # voice client 對 PCM 來源每 20ms 編一次 Opus，這段 CPU 算在 bot 行程上
+                if encoder is not None and not source.is_opus():
+                    start = time.process_time()
+                    encoder.encode(frame, encoder.SAMPLES_PER_FRAME)
+                    python_cpu += time.process_time() - start
+        finally:
+            source.cleanup()
+
+    return children_cpu() - ffmpeg_before, python_cpu, frames
+
+
+async def main():
+    print(f"sample: {SECONDS}s opus/webm, {STREAMS} streams per path", flush=True)
+    if encoder is None:
+        print("libopus 沒載入：PCM 路徑不含 discord.py 編碼的 CPU（實際只會更高）", flush=True)
+
+    for name, mode, codec in (("pcm", "pcm", None), ("encode", "auto", "aac"), ("copy", "auto", "opus")):
+        ffmpeg_cpu, python_cpu, frames = await run_path(mode, codec)
+        total = ffmpeg_cpu + python_cpu
+        audio_minutes = STREAMS * SECONDS / 60
+        print(
+            f"{name}: ffmpeg {ffmpeg_cpu:.2f}s + encode {python_cpu:.2f}s cpu, {frames} frames"
+            f" -> {total / audio_minutes * 1e3:.0f} ms cpu per stream-minute",
+            flush=True,
+        )
+
+    print(f"path counts: {bot.format_audio_path_stats()}", flush=True)
+
+
+try:
+    asyncio.run(main())
+finally:
+    shutil.rmtree(workdir, ignore_errors=True)
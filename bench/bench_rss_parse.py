@@ -0,0 +1,53 @@
+# 整份 ElementTree 解析 vs 串流解析（遇到過期文章提早停）的時間與記憶體峰值
+# 用法：python bench/bench_rss_parse.py [items]
+import datetime
+import sys
+import tracemalloc
+
+from _common import load_bot, timed
+
+ITEMS = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+bot = load_bot()
+
+now = datetime.datetime.now(datetime.timezone.utc)
+cutoff = now - datetime.timedelta(hours=bot.NEWS_MAX_AGE_HOURS)
+items = []
+for i in range(ITEMS):
+    published = now - datetime.timedelta(minutes=10 * i)
+    items.append(
+        f"<item><title>Bitcoin news {i}</title><link>https://example.com/{i}</link>"
+        f"<pubDate>{published.strftime('%a, %d %b %Y %H:%M:%S +0000')}</pubDate>"
+        f"<description>{'lorem ipsum ' * 40}</description></item>"
+    )
+data = ("<rss><channel>" + "".join(items) + "</channel></rss>").encode()
+
+
+def whole_document():
+    root = bot.ET.fromstring(data)
+    articles = []
+    for elem in root.findall(".//item"):
+        article = bot._article_from_item(elem)
+        if article and article["published_at"] >= cutoff:
+            articles.append(article)
+    return articles
+
+
+def streaming():
+    parser = bot.RssStreamParser(cutoff)
+    for i in range(0, len(data), bot.RSS_CHUNK_SIZE):
+        parser.feed(data[i:i + bot.RSS_CHUNK_SIZE])
+        if parser.done:
+            break
+    return parser.close()
+
+
+print(f"feed: {ITEMS} items, {len(data) / 1e6:.1f} MB", flush=True)
+for fn in (whole_document, streaming):
+    tracemalloc.start()
+    start = timed()
+    articles = fn()
+    elapsed = timed() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{fn.__name__}: {len(articles)} articles, {elapsed * 1e3:.1f} ms, peak {peak / 1e6:.1f} MB", flush=True)
@@ -0,0 +1,55 @@
+# 每輪評估（含定期 SQLite 寫入）在「不落地 / 落地」兩種設定下的成本
+# 用法：python bench/bench_state_persistence.py [symbols] [ticks] [movers_per_tick]
+import asyncio
+import datetime
+import os
+import random
+import sys
+import tempfile
+
+from _common import NullChannel, discard_alerts, load_bot, report, timed
+
+SYMBOLS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+TICKS = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+MOVERS = int(sys.argv[3]) if len(sys.argv) > 3 else SYMBOLS // 10
+# 模擬 STATE_FLUSH_INTERVAL_SECONDS=5、每秒一輪
+FLUSH_EVERY = 5
+
+names = [f"C{i}" for i in range(SYMBOLS)]
+bot = load_bot(
+    CRYPTO_SYMBOLS=",".join(names),
+    CRYPTO_BREAKOUT_STEPS=",".join(f"{name}:10" for name in names),
+)
+discard_alerts(bot)
+
+
+async def run(label: str, store):
+    bot.state_store = store
+    rng = random.Random(1)
+    channel = NullChannel()
+    start_dt = datetime.datetime(2026, 1, 1, tzinfo=bot.TZ)
+    prices = {name: 100.0 + i for i, name in enumerate(names)}
+
+    start = timed()
+    for k in range(TICKS):
+        for name in rng.sample(names, MOVERS):
+            prices[name] *= rng.uniform(0.999, 1.001)
+        await bot.process_price_batch(channel, start_dt + datetime.timedelta(seconds=k), prices)
+        if store is not None and k % FLUSH_EVERY == FLUSH_EVERY - 1:
+            await store.flush()
+    report(f"{label} ({SYMBOLS} symbols, {MOVERS} movers/tick)", TICKS, timed() - start, "tick")
+    if store is not None:
+        print(f"  {store.format_stats()}", flush=True)
+
+
+async def main():
+    await run("persistence off", None)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = bot.StateStore(os.path.join(tmp, "bench_state.db"))
+        await store.load()
+        await run("persistence on ", store)
+        await store.close()
+
+
+asyncio.run(main())
@@ -6,16 +6,31 @@ import os
 import random
 from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
-import yt_dlp
 import base64
 import tempfile
 import aiohttp
 import math
+import numpy as np
+import bisect
 from typing import Optional
+from collections import deque
 import json
+import shlex
+import hashlib
+import urllib.parse
+import re
+import heapq
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import sqlite3
+import time
 import xml.etree.ElementTree as ET
 from email.utils import parsedate_to_datetime
 
+import yt_worker
+
 print("BOOT VERSION: 2026-03-21-crypto-alert-daily-summary-customalert-1", flush=True)
 
 # =========================
@@ -53,16 +68,41 @@ CRYPTO_ALERT_CHANNEL_ID = int(CRYPTO_ALERT_CHANNEL_ID_STR)
 DAILY_SUMMARY_HOUR = 19
 DAILY_SUMMARY_MINUTE = 0
 
+# 新聞來源（逗號分隔），可以放到幾十個
 NEWS_FEEDS = [
-    "https://www.coindesk.com/arc/outboundfeeds/rss/",
-    "https://cointelegraph.com/rss",
+    url.strip()
+    for url in os.getenv(
+        "NEWS_FEEDS",
+        "https://www.coindesk.com/arc/outboundfeeds/rss/,https://cointelegraph.com/rss",
+    ).split(",")
+    if url.strip()
 ]
+# 同時抓所有 feed 的總時限，超過的 feed 直接放棄
+NEWS_FETCH_DEADLINE_SECONDS = float(os.getenv("NEWS_FETCH_DEADLINE_SECONDS", "10"))
+
+
+def _parse_keyword_weights(text: str, default_weight: int = 2) -> dict[str, int]:
+    # "bitcoin:3,etf,sec:1" -> {"bitcoin": 3, "etf": 2, "sec": 1}
+    weights = {}
+    for part in text.split(","):
+        keyword, _, weight = part.partition(":")
+        keyword = " ".join(keyword.lower().split())
+        if keyword:
+            weights[keyword] = int(weight) if weight.strip() else default_weight
+    return weights
 
-NEWS_KEYWORDS = [
-    "bitcoin", "btc", "ethereum", "eth", "bnb", "binance",
-    "etf", "sec", "fed", "hack", "approval", "regulation",
-    "stablecoin", "solana", "defi"
-]
+
+# 新聞關鍵字權重：標題或內文出現就加分
+NEWS_KEYWORD_WEIGHTS = _parse_keyword_weights(os.getenv(
+    "NEWS_KEYWORD_WEIGHTS",
+    "bitcoin,btc,ethereum,eth,bnb,binance,etf,sec,fed,hack,approval,regulation,stablecoin,solana,defi",
+))
+
+# 出現在標題時額外加分的關鍵字
+NEWS_TITLE_KEYWORD_WEIGHTS = _parse_keyword_weights(os.getenv(
+    "NEWS_TITLE_KEYWORD_WEIGHTS",
+    "bitcoin,btc,ethereum,eth,binance,etf,sec,hack",
+))
 
 last_daily_summary_date: datetime.date | None = None
 
@@ -77,11 +117,257 @@ intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 
-bot = commands.Bot(command_prefix="!", intents=intents, help_command=None)
+# =========================
+# 共用 HTTP 連線池（Binance / RSS 共用同一個 session）
+# =========================
+
+# 每種外部端點各自的逾時設定
+HTTP_TIMEOUTS = {
+    "binance": aiohttp.ClientTimeout(total=10, connect=5, sock_read=8),
+    "rss": aiohttp.ClientTimeout(total=15, connect=5, sock_read=10),
+    "default": aiohttp.ClientTimeout(total=15),
+}
+
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "32"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "8"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+
+
+class HttpClient:
+    def __init__(self):
+        self._session: aiohttp.ClientSession | None = None
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+
+    async def _on_connection_created(self, session, ctx, params):
+        self.connections_created += 1
+
+    async def _on_connection_reused(self, session, ctx, params):
+        self.connections_reused += 1
+
+    async def _on_request_start(self, session, ctx, params):
+        self.requests += 1
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        if self._session is not None and not self._session.closed:
+            return self._session
+
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_end.append(self._on_connection_created)
+        trace.on_connection_reuseconn.append(self._on_connection_reused)
+        trace.on_request_start.append(self._on_request_start)
+
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            use_dns_cache=True,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=HTTP_TIMEOUTS["default"],
+            trace_configs=[trace],
+        )
+        print(
+            f"[http] session created (limit={HTTP_POOL_LIMIT}, per_host={HTTP_POOL_LIMIT_PER_HOST}, "
+            f"dns_ttl={HTTP_DNS_CACHE_TTL}s, keepalive={HTTP_KEEPALIVE_SECONDS}s)",
+            flush=True,
+        )
+        return self._session
+
+    async def start(self):
+        self._ensure_session()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            print(f"[http] session closed（{self.format_stats()}）", flush=True)
+        self._session = None
+
+    def get(self, url: str, endpoint: str = "default", **kwargs):
+        timeout = HTTP_TIMEOUTS.get(endpoint, HTTP_TIMEOUTS["default"])
+        return self._ensure_session().get(url, timeout=timeout, **kwargs)
+
+    def ws_connect(self, url: str, **kwargs):
+        return self._ensure_session().ws_connect(url, **kwargs)
+
+    @property
+    def reuse_ratio(self) -> float:
+        total = self.connections_created + self.connections_reused
+        if total == 0:
+            return 0.0
+        return self.connections_reused / total
+
+    def format_stats(self) -> str:
+        return (
+            f"requests={self.requests} new_conn={self.connections_created} "
+            f"reused={self.connections_reused} reuse_ratio={self.reuse_ratio:.0%}"
+        )
+
+
+http_client = HttpClient()
+
+
+# =========================
+# Discord 發送排程：每個頻道一個 token bucket + 優先佇列
+# =========================
+
+# 數字越小越先送
+PRIORITY_CRITICAL = 0   # 自訂價格提醒
+PRIORITY_ALERT = 1      # 波動 / 關卡提醒
+PRIORITY_NORMAL = 2     # 每日摘要、倒數、睡覺檢查、使用者回報
+PRIORITY_LOW = 3        # 抽獎登記回覆之類，過期可以直接丟掉
+
+PRIORITY_NAMES = {
+    PRIORITY_CRITICAL: "critical",
+    PRIORITY_ALERT: "alert",
+    PRIORITY_NORMAL: "normal",
+    PRIORITY_LOW: "low",
+}
+
+# Discord 單一頻道大約每 5 秒 5 則
+OUTBOUND_BUCKET_CAPACITY = 5
+OUTBOUND_BUCKET_REFILL_PER_SECOND = 1.0
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def wait_time(self) -> float:
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.refill_per_second
+
+    def consume(self):
+        self._refill()
+        self.tokens -= 1
+
+
+class OutboundScheduler:
+    def __init__(self):
+        self._seq = itertools.count()
+        # channel id -> [heap, TokenBucket, worker task]
+        self._queues: dict[int, list] = {}
+        self.sent = {p: 0 for p in PRIORITY_NAMES}
+        self.wait_total = {p: 0.0 for p in PRIORITY_NAMES}
+        self.wait_max = {p: 0.0 for p in PRIORITY_NAMES}
+        self.dropped = 0
+
+    def depth(self) -> int:
+        return sum(len(q[0]) for q in self._queues.values())
+
+    async def send(
+        self,
+        channel,
+        content: str | None = None,
+        *,
+        priority: int = PRIORITY_NORMAL,
+        max_age: float | None = None,
+        **kwargs,
+    ):
+        # 回傳送出的 discord.Message；排隊超過 max_age 秒被丟掉時回傳 None
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(channel.id)
+        if queue is None:
+            queue = [[], TokenBucket(OUTBOUND_BUCKET_CAPACITY, OUTBOUND_BUCKET_REFILL_PER_SECOND), None]
+            self._queues[channel.id] = queue
+
+        item = {
+            "channel": channel,
+            "content": content,
+            "kwargs": kwargs,
+            "enqueued_at": time.monotonic(),
+            "max_age": max_age,
+            "future": future,
+        }
+        heapq.heappush(queue[0], (priority, next(self._seq), item))
+
+        if queue[2] is None or queue[2].done():
+            queue[2] = asyncio.create_task(self._worker(queue))
+
+        return await future
+
+    async def _worker(self, queue: list):
+        heap, bucket, _ = queue
+        while heap:
+            wait = bucket.wait_time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            priority, _, item = heapq.heappop(heap)
+            waited = time.monotonic() - item["enqueued_at"]
+
+            future = item["future"]
+            if future.done():
+                # 呼叫端已經取消了
+                continue
+            if item["max_age"] is not None and waited > item["max_age"]:
+                self.dropped += 1
+                future.set_result(None)
+                continue
+
+            bucket.consume()
+            try:
+                message = await item["channel"].send(item["content"], **item["kwargs"])
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+
+            if not future.done():
+                future.set_result(message)
+            self.sent[priority] += 1
+            self.wait_total[priority] += waited
+            self.wait_max[priority] = max(self.wait_max[priority], waited)
+
+    def format_stats(self) -> str:
+        parts = []
+        for priority, name in PRIORITY_NAMES.items():
+            count = self.sent[priority]
+            avg = self.wait_total[priority] / count if count else 0.0
+            parts.append(f"{name}={count}(avg {avg:.2f}s / max {self.wait_max[priority]:.2f}s)")
+        return f"depth={self.depth()} dropped={self.dropped} " + " ".join(parts)
+
+
+outbound = OutboundScheduler()
 
-# 音樂狀態
-music_queue = []
-is_playing = False
+
+class TaBot(commands.Bot):
+    async def setup_hook(self):
+        await http_client.start()
+        feed_cache.load()
+        seen_news.load()
+        if state_store is not None:
+            await state_store.load()
+            self.loop.create_task(state_store.run())
+        self.loop.create_task(yt_extractor.warm_up())
+        cleanup_legacy_temp_files()
+        if audio_cache is not None:
+            audio_cache.load()
+
+    async def close(self):
+        yt_extractor.close()
+        if state_store is not None:
+            await state_store.close()
+        await http_client.close()
+        await super().close()
+
+
+bot = TaBot(command_prefix="!", intents=intents, help_command=None)
 
 task_started = False
 
@@ -89,37 +375,433 @@ task_started = False
 # Crypto Alert 設定
 # =========================
 
-price_history: dict[str, list[tuple[datetime.datetime, float]]] = {
-    "BTC": [],
-    "ETH": [],
-    "BNB": [],
-}
+# 監控的幣種（逗號分隔），交易對 = 幣種 + CRYPTO_QUOTE_ASSET
+CRYPTO_SYMBOLS = [s.strip().upper() for s in os.getenv("CRYPTO_SYMBOLS", "BTC,ETH,BNB").split(",") if s.strip()]
+CRYPTO_QUOTE_ASSET = os.getenv("CRYPTO_QUOTE_ASSET", "USDT").strip().upper()
 
-last_price_bucket = {
-    "BTC": None,   # 每 1000
-    "ETH": None,   # 每 100
-}
 
-last_percent_alert_at: dict[str, dict[str, datetime.datetime | None]] = {
-    "BTC": {"15m_up": None, "15m_down": None, "1h_up": None, "1h_down": None},
-    "ETH": {"15m_up": None, "15m_down": None, "1h_up": None, "1h_down": None},
-    "BNB": {"15m_up": None, "15m_down": None, "1h_up": None, "1h_down": None},
-}
+def _parse_symbol_values(text: str) -> dict[str, float]:
+    # "BTC:1000,ETH:100" -> {"BTC": 1000.0, "ETH": 100.0}
+    result = {}
+    for part in text.split(","):
+        if ":" not in part:
+            continue
+        symbol, value = part.split(":", 1)
+        result[symbol.strip().upper()] = float(value)
+    return result
+
+
+def _parse_duration_seconds(text: str) -> int:
+    # "30s" / "15m" / "1h" / "1d"
+    text = text.strip().lower()
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def _duration_label(seconds: int) -> str:
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds % size == 0:
+            return f"{seconds // size}{unit}"
+    return f"{seconds}s"
+
+
+def _parse_window_rules(text: str) -> list[dict]:
+    # "15m:1:15,1h:2:30" -> 時間窗:門檻%:冷卻分鐘
+    rules = []
+    for part in text.split(","):
+        fields = [f.strip() for f in part.split(":")]
+        if len(fields) != 3:
+            continue
+        seconds = _parse_duration_seconds(fields[0])
+        rules.append({
+            "label": _duration_label(seconds),
+            "seconds": seconds,
+            "threshold": float(fields[1]),
+            "cooldown_minutes": float(fields[2]),
+        })
+    return rules
+
+
+def _symbol_window_rules(env_name: str, default_text: str, symbol: str) -> list[dict]:
+    # 個別幣種可用 <env_name>_<SYMBOL> 覆寫，例如 CRYPTO_PERCENT_WINDOWS_DOGE=15m:3:15
+    return _parse_window_rules(os.getenv(f"{env_name}_{symbol}", default_text))
+
+
+# 每跨過一個 step 就提醒（沒設定的幣種不做整數關卡提醒）
+CRYPTO_BREAKOUT_STEPS = _parse_symbol_values(os.getenv("CRYPTO_BREAKOUT_STEPS", "BTC:1000,ETH:100"))
+
+# 漲跌幅提醒：時間窗內「目前價格 vs 窗口第一筆價格」超過門檻
+CRYPTO_PERCENT_WINDOWS_TEXT = os.getenv("CRYPTO_PERCENT_WINDOWS", "15m:1:15,1h:2:30")
+CRYPTO_PERCENT_WINDOWS = _parse_window_rules(CRYPTO_PERCENT_WINDOWS_TEXT)
+
+# 回撤提醒：時間窗內「高點到之後低點」的最大跌幅超過門檻（預設關閉）
+CRYPTO_DRAWDOWN_WINDOWS_TEXT = os.getenv("CRYPTO_DRAWDOWN_WINDOWS", "")
+CRYPTO_DRAWDOWN_WINDOWS = _parse_window_rules(CRYPTO_DRAWDOWN_WINDOWS_TEXT)
+
+# 每個時間窗切成這麼多格，格內的報價先彙總成一筆再進滑動窗
+VOLATILITY_WINDOW_SLOTS = 120
+
+
+# 時間窗彙總值：(first, last, max, min, max_drawdown)，每個欄位都是以幣種為索引的陣列
+def _window_agg_single(row: np.ndarray) -> tuple:
+    drawdown = np.where(np.isnan(row), np.nan, 0.0)
+    return row, row, row, row, drawdown
+
+
+def _window_agg_combine(left: tuple | None, right: tuple | None) -> tuple | None:
+    # left 在時間上早於 right；跨界回撤 = left 的高點跌到 right 的低點
+    if left is None:
+        return right
+    if right is None:
+        return left
+    l_first, l_last, l_max, l_min, l_dd = left
+    r_first, r_last, r_max, r_min, r_dd = right
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cross_dd = (l_max - r_min) / l_max
+    return (
+        np.where(np.isnan(l_first), r_first, l_first),
+        np.where(np.isnan(r_last), l_last, r_last),
+        np.fmax(l_max, r_max),
+        np.fmin(l_min, r_min),
+        np.fmax(np.fmax(l_dd, r_dd), cross_dd),
+    )
+
+
+class RollingWindow:
+    # 以「雙堆疊佇列」維護滑動窗的彙總值：push / 淘汰 / 查詢都是均攤 O(1)，
+    # 而且每一步都對所有幣種一起做向量運算。
+    def __init__(self, seconds: int, slots: int = VOLATILITY_WINDOW_SLOTS):
+        self.seconds = seconds
+        self.slot_seconds = max(1.0, seconds / slots)
+        self._front: list[tuple[float, tuple]] = []          # (格子結束時間, 從這格到 front 最新一格的彙總)
+        self._back: list[tuple[float, tuple, tuple]] = []    # (格子結束時間, 這格彙總, back 從最舊到這格的彙總)
+        self._open: tuple | None = None
+        self._open_start: float | None = None
+
+    def _close_open_slot(self):
+        end = self._open_start + self.slot_seconds
+        prefix = _window_agg_combine(self._back[-1][2] if self._back else None, self._open)
+        self._back.append((end, self._open, prefix))
+        self._open = None
+
+    def _pop_oldest(self):
+        if not self._front:
+            suffix = None
+            for end, agg, _ in reversed(self._back):
+                suffix = _window_agg_combine(agg, suffix)
+                self._front.append((end, suffix))
+            self._back.clear()
+        self._front.pop()
+
+    def _oldest_end(self) -> float | None:
+        if self._front:
+            return self._front[-1][0]
+        if self._back:
+            return self._back[0][0]
+        return None
+
+    def push(self, ts: float, row: np.ndarray):
+        slot_start = ts - ts % self.slot_seconds
+        if self._open is not None and slot_start > self._open_start:
+            self._close_open_slot()
+        if self._open is None:
+            self._open_start = slot_start
+        self._open = _window_agg_combine(self._open, _window_agg_single(row))
+
+        cutoff = ts - self.seconds
+        while True:
+            oldest_end = self._oldest_end()
+            if oldest_end is None or oldest_end > cutoff:
+                break
+            self._pop_oldest()
+
+    def aggregate(self) -> tuple | None:
+        agg = self._front[-1][1] if self._front else None
+        agg = _window_agg_combine(agg, self._back[-1][2] if self._back else None)
+        return _window_agg_combine(agg, self._open)
+
+
+class CryptoWatchState:
+    # 所有幣種的提醒狀態都放在以幣種為索引的 numpy 陣列裡（NaN = 尚無資料/未啟用），
+    # 每次評估對全部幣種做一次向量化檢查。
+    def __init__(self, symbols: list[str], breakout_steps: dict[str, float]):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        n = len(self.symbols)
+
+        self.current = np.full(n, np.nan)
+        # 上一次評估時的價格，用來判斷是否穿越自訂提醒價位
+        self.last_seen = np.full(n, np.nan)
+        self.breakout_steps = np.array([breakout_steps.get(s, np.nan) for s in self.symbols], dtype=float)
+        self.last_bucket = np.full(n, np.nan)
+
+        # 時間窗規則：label -> {"percent": (門檻陣列, 冷卻秒陣列), "drawdown": (...)}
+        self.window_rules: dict[str, dict[str, tuple[np.ndarray, np.ndarray]]] = {}
+        self.windows: dict[str, RollingWindow] = {}
+        for kind, env_name, default_text in (
+            ("percent", "CRYPTO_PERCENT_WINDOWS", CRYPTO_PERCENT_WINDOWS_TEXT),
+            ("drawdown", "CRYPTO_DRAWDOWN_WINDOWS", CRYPTO_DRAWDOWN_WINDOWS_TEXT),
+        ):
+            for i, symbol in enumerate(self.symbols):
+                for rule in _symbol_window_rules(env_name, default_text, symbol):
+                    label = rule["label"]
+                    if label not in self.windows:
+                        self.windows[label] = RollingWindow(rule["seconds"])
+                    rules = self.window_rules.setdefault(label, {})
+                    if kind not in rules:
+                        rules[kind] = (np.full(n, np.nan), np.full(n, np.nan))
+                    rules[kind][0][i] = rule["threshold"]
+                    rules[kind][1][i] = rule["cooldown_minutes"] * 60
+
+        # "15m_up" / "15m_down" / "1h_drawdown" ... -> 上次提醒的 epoch 秒
+        self.percent_alert_at: dict[str, np.ndarray] = {}
+        for label, rules in self.window_rules.items():
+            directions = (("up", "down") if "percent" in rules else ()) + (("drawdown",) if "drawdown" in rules else ())
+            for direction in directions:
+                self.percent_alert_at[f"{label}_{direction}"] = np.full(n, np.nan)
+
+    def push_window_row(self, ts: float, row: np.ndarray):
+        for window in self.windows.values():
+            window.push(ts, row)
+
+
+watch_state = CryptoWatchState(CRYPTO_SYMBOLS, CRYPTO_BREAKOUT_STEPS)
+
+
+PRICE_ALERT_EPSILON = 1e-9
+
+
+class PriceAlertIndex:
+    # 依價格排序的提醒索引：_prices 與 _alerts 平行排列，同一價位只會有一筆。
+    # 觸發的提醒會直接從索引移除。
+    def __init__(self):
+        self._prices: list[float] = []
+        self._alerts: list[dict] = []
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    def __iter__(self):
+        return iter(self._alerts)
+
+    def find(self, price: float) -> int | None:
+        idx = bisect.bisect_left(self._prices, price - PRICE_ALERT_EPSILON)
+        if idx < len(self._prices) and abs(self._prices[idx] - price) < PRICE_ALERT_EPSILON:
+            return idx
+        return None
+
+    def add(self, alert: dict) -> bool:
+        price = alert["price"]
+        if self.find(price) is not None:
+            return False
+        idx = bisect.bisect_left(self._prices, price)
+        self._prices.insert(idx, price)
+        self._alerts.insert(idx, alert)
+        return True
+
+    def remove(self, price: float) -> dict | None:
+        idx = self.find(price)
+        if idx is None:
+            return None
+        del self._prices[idx]
+        return self._alerts.pop(idx)
+
+    def pop_crossed(self, prev_price: float, current_price: float) -> list[dict]:
+        # 上漲：prev < target <= current；下跌：prev > target >= current
+        if current_price >= prev_price:
+            lo = bisect.bisect_right(self._prices, prev_price)
+            hi = bisect.bisect_right(self._prices, current_price)
+        else:
+            lo = bisect.bisect_left(self._prices, current_price)
+            hi = bisect.bisect_left(self._prices, prev_price)
+
+        if lo >= hi:
+            return []
+
+        fired = self._alerts[lo:hi]
+        del self._prices[lo:hi]
+        del self._alerts[lo:hi]
+        return fired
+
+
+# 使用者自訂價格提醒（開啟 STATE_PERSIST_ENABLED 時會存到 SQLite，重啟後自動載回）
+custom_price_alerts: dict[str, PriceAlertIndex] = {symbol: PriceAlertIndex() for symbol in CRYPTO_SYMBOLS}
+
+# =========================
+# Crypto 狀態持久化（SQLite WAL，寫入延後批次處理）
+# =========================
+
+STATE_PERSIST_ENABLED = os.getenv("STATE_PERSIST_ENABLED", "1") == "1"
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "bot_state.db")
+STATE_FLUSH_INTERVAL_SECONDS = float(os.getenv("STATE_FLUSH_INTERVAL_SECONDS", "5"))
 
-# 使用者自訂價格提醒（記憶體保存，重啟後會消失）
-custom_price_alerts: dict[str, list[dict]] = {
-    "BTC": [],
-    "ETH": [],
-    "BNB": [],
-}
 
-# 上一次看到的價格，用來判斷是否穿越提醒價位
-last_seen_prices: dict[str, float | None] = {
-    "BTC": None,
-    "ETH": None,
-    "BNB": None,
+def _dump_percent_alert_at() -> dict:
+    result: dict[str, dict[str, float]] = {}
+    for key, values in watch_state.percent_alert_at.items():
+        for i in np.flatnonzero(~np.isnan(values)):
+            result.setdefault(watch_state.symbols[i], {})[key] = float(values[i])
+    return result
+
+
+def _restore_percent_alert_at(data: dict):
+    for symbol, keys in data.items():
+        i = watch_state.index.get(symbol)
+        if i is None:
+            continue
+        for key, value in keys.items():
+            if key not in watch_state.percent_alert_at or value is None:
+                continue
+            watch_state.percent_alert_at[key][i] = float(value)
+
+
+def _dump_symbol_array(values: np.ndarray) -> dict:
+    return {
+        symbol: float(value)
+        for symbol, value in zip(watch_state.symbols, values.tolist())
+        if not math.isnan(value)
+    }
+
+
+def _restore_symbol_array(values: np.ndarray, data: dict):
+    for symbol, value in data.items():
+        i = watch_state.index.get(symbol)
+        if i is not None and value is not None:
+            values[i] = float(value)
+
+
+# 要持久化的冷卻/狀態：名稱 -> (匯出成 JSON 物件, 從 JSON 物件載回)
+PERSISTED_STATE = {
+    "last_percent_alert_at": (_dump_percent_alert_at, _restore_percent_alert_at),
+    "last_price_bucket": (
+        lambda: _dump_symbol_array(watch_state.last_bucket),
+        lambda data: _restore_symbol_array(watch_state.last_bucket, data),
+    ),
+    "last_seen_prices": (
+        lambda: _dump_symbol_array(watch_state.last_seen),
+        lambda data: _restore_symbol_array(watch_state.last_seen, data),
+    ),
 }
 
+
+class StateStore:
+    # tick 熱路徑只記錄「哪些東西變了」，真正的 SQLite 寫入由背景任務定期批次送出，
+    # 而且在 executor 執行緒裡跑，不會卡住 event loop。
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._flush_lock = asyncio.Lock()
+        # (symbol, price) -> alert dict（新增）或 None（刪除）；同一個 key 只留最後一次變更
+        self._pending_alerts: dict[tuple[str, float], dict | None] = {}
+        self._dirty_state: set[str] = set()
+        self.flushes = 0
+        self.rows_written = 0
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS custom_price_alerts ("
+            "symbol TEXT NOT NULL, price REAL NOT NULL, created_by INTEGER, "
+            "PRIMARY KEY (symbol, price))"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS alert_state (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.commit()
+        self._conn = conn
+
+    def _read_all(self):
+        alerts = self._conn.execute("SELECT symbol, price, created_by FROM custom_price_alerts").fetchall()
+        state = dict(self._conn.execute("SELECT name, value FROM alert_state").fetchall())
+        return alerts, state
+
+    async def load(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._open)
+        alerts, state = await loop.run_in_executor(None, self._read_all)
+
+        loaded = 0
+        for symbol, price, created_by in alerts:
+            index = custom_price_alerts.get(symbol)
+            if index is not None and index.add({"price": price, "created_by": created_by}):
+                loaded += 1
+
+        for name, (_, restore) in PERSISTED_STATE.items():
+            if name in state:
+                restore(json.loads(state[name]))
+
+        print(f"[state] 已從 {self.path} 載入 {loaded} 筆價格提醒", flush=True)
+
+    def alert_added(self, symbol: str, alert: dict):
+        self._pending_alerts[(symbol, alert["price"])] = alert
+
+    def alert_removed(self, symbol: str, price: float):
+        self._pending_alerts[(symbol, price)] = None
+
+    def mark_dirty(self, *names: str):
+        self._dirty_state.update(names)
+
+    def _write(self, alert_ops: dict[tuple[str, float], dict | None], state_rows: list[tuple[str, str]]):
+        with self._conn:
+            for (symbol, price), alert in alert_ops.items():
+                if alert is None:
+                    self._conn.execute(
+                        "DELETE FROM custom_price_alerts WHERE symbol = ? AND price = ?", (symbol, price)
+                    )
+                else:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO custom_price_alerts (symbol, price, created_by) VALUES (?, ?, ?)",
+                        (symbol, price, alert.get("created_by")),
+                    )
+            self._conn.executemany("INSERT OR REPLACE INTO alert_state (name, value) VALUES (?, ?)", state_rows)
+
+    async def flush(self):
+        async with self._flush_lock:
+            if self._conn is None or (not self._pending_alerts and not self._dirty_state):
+                return
+
+            # 在 loop 執行緒上拍快照，再丟到 executor 寫入
+            alert_ops, self._pending_alerts = self._pending_alerts, {}
+            state_rows = [
+                (name, json.dumps(PERSISTED_STATE[name][0]()))
+                for name in self._dirty_state
+            ]
+            self._dirty_state = set()
+
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write, alert_ops, state_rows)
+            except Exception as e:
+                print(f"[state] 寫入失敗，下次重試：{e}", flush=True)
+                for key, alert in alert_ops.items():
+                    self._pending_alerts.setdefault(key, alert)
+                self._dirty_state.update(name for name, _ in state_rows)
+                return
+
+            self.flushes += 1
+            self.rows_written += len(alert_ops) + len(state_rows)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(STATE_FLUSH_INTERVAL_SECONDS)
+            await self.flush()
+
+    async def close(self):
+        await self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def format_stats(self) -> str:
+        return (
+            f"path={self.path} flushes={self.flushes} rows={self.rows_written} "
+            f"pending_alerts={len(self._pending_alerts)} dirty={len(self._dirty_state)}"
+        )
+
+
+state_store: StateStore | None = StateStore(STATE_DB_PATH) if STATE_PERSIST_ENABLED else None
+
 # =========================
 # Sleep Check 狀態（不落地保存）
 # =========================
@@ -144,90 +826,238 @@ def _allowed_mentions_all():
 def fmt_price(symbol: str, price: float) -> str:
     if symbol == "BTC":
         return f"${price:,.0f}"
+    if price < 1:
+        return f"${price:.8f}".rstrip("0").rstrip(".")
     return f"${price:,.2f}"
 
 
 def fmt_price_compact(symbol: str, price: float) -> str:
     if symbol == "BTC":
         return f"${price:,.0f}"
+    if price < 1:
+        return fmt_price(symbol, price)
     return f"${price:,.0f}" if price >= 100 else f"${price:,.2f}"
 
 
-def pct_change(old: float, new: float) -> float:
-    if old == 0:
-        return 0.0
-    return (new - old) / old * 100.0
-
-
-def get_bucket(price: float, step: int) -> int:
-    return math.floor(price / step)
+def fmt_level(value: float) -> str:
+    # 整數關卡價位：1000.0 -> "1000"，0.5 -> "0.5"
+    return str(int(value)) if float(value).is_integer() else f"{value:g}"
 
 
-def should_send_cooldown(last_time: datetime.datetime | None, now: datetime.datetime, minutes: int) -> bool:
-    if last_time is None:
-        return True
-    return (now - last_time).total_seconds() >= minutes * 60
+def format_window(seconds: int) -> str:
+    if seconds % 86400 == 0:
+        return f"{seconds // 86400} 天"
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600} 小時"
+    if seconds % 60 == 0:
+        return f"{seconds // 60} 分鐘"
+    return f"{seconds} 秒"
 
 
 def normalize_coin_symbol(symbol: str) -> str | None:
     s = symbol.strip().upper()
-    if s in {"BTC", "ETH", "BNB"}:
+    if s in watch_state.index:
         return s
     return None
 
 
+def supported_symbols_text(limit: int = 10) -> str:
+    text = " / ".join(CRYPTO_SYMBOLS[:limit])
+    if len(CRYPTO_SYMBOLS) > limit:
+        text += f" 等 {len(CRYPTO_SYMBOLS)} 種"
+    return text
+
+
+def describe_crypto_alert_rules() -> str:
+    coins = supported_symbols_text(limit=3)
+    lines = []
+    for w in CRYPTO_PERCENT_WINDOWS:
+        lines.append(f"  {coins}：{format_window(w['seconds'])}內漲跌超過 {w['threshold']:g}% 提醒")
+    for w in CRYPTO_DRAWDOWN_WINDOWS:
+        lines.append(f"  {coins}：{format_window(w['seconds'])}內最大回撤超過 {w['threshold']:g}% 提醒")
+    for symbol, step in CRYPTO_BREAKOUT_STEPS.items():
+        if symbol in watch_state.index:
+            lines.append(f"  {symbol}：每跨 {fmt_level(step)} 美元提醒")
+    return "\n".join(lines)
+
+
+BINANCE_API_BASE = "https://data-api.binance.vision/api/v3"
+
+# Binance 的 symbols=[...] 一次最多帶這麼多個交易對，超過就切批
+BINANCE_BATCH_SIZE = 100
+
+BINANCE_SYMBOL_MAP = {symbol: f"{symbol}{CRYPTO_QUOTE_ASSET}" for symbol in CRYPTO_SYMBOLS}
+
+# 每日摘要只列這幾個幣種，避免監控幾百個交易對時訊息爆長
+DAILY_SUMMARY_SYMBOLS = [
+    s for s in (x.strip().upper() for x in os.getenv("DAILY_SUMMARY_SYMBOLS", "BTC,ETH,BNB").split(","))
+    if s in BINANCE_SYMBOL_MAP
+] or CRYPTO_SYMBOLS[:3]
+
+
+async def _binance_get_json(path: str, params: dict, label: str):
+    async with http_client.get(f"{BINANCE_API_BASE}/{path}", "binance", params=params) as resp:
+        if resp.status != 200:
+            text = await resp.text()
+            raise RuntimeError(f"{label} 錯誤：{resp.status} {text[:200]}")
+        return await resp.json()
+
+
+async def fetch_binance_tickers(path: str, pairs: list[str], label: str) -> dict[str, dict]:
+    # 一批一個請求；整批失敗時退回「同時逐一請求」
+    async def _fetch_chunk(chunk: list[str]) -> list[dict]:
+        try:
+            symbols_param = json.dumps(chunk, separators=(",", ":"))
+            return await _binance_get_json(path, {"symbols": symbols_param}, label)
+        except Exception as e:
+            print(f"[binance] {path} 批次請求失敗，改為逐一請求：{e}", flush=True)
+            items = await asyncio.gather(
+                *(_binance_get_json(path, {"symbol": pair}, label) for pair in chunk),
+                return_exceptions=True
+            )
+            # 單一交易對失敗（下市、拼錯）只丟掉那一個，其他照常回傳
+            ok = []
+            for pair, item in zip(chunk, items):
+                if isinstance(item, Exception):
+                    print(f"[binance] {path} {pair} 請求失敗，略過：{item}", flush=True)
+                else:
+                    ok.append(item)
+            return ok
+
+    chunks = [pairs[i:i + BINANCE_BATCH_SIZE] for i in range(0, len(pairs), BINANCE_BATCH_SIZE)]
+    results: dict[str, dict] = {}
+    for items in await asyncio.gather(*(_fetch_chunk(chunk) for chunk in chunks)):
+        for item in items:
+            results[item["symbol"]] = item
+
+    return results
+
+
 async def fetch_crypto_prices():
-    base_url = "https://data-api.binance.vision/api/v3/ticker/price"
-    symbol_map = {
-        "BTC": "BTCUSDT",
-        "ETH": "ETHUSDT",
-        "BNB": "BNBUSDT",
-    }
+    tickers = await fetch_binance_tickers("ticker/price", list(BINANCE_SYMBOL_MAP.values()), "Binance API")
 
-    timeout = aiohttp.ClientTimeout(total=15)
     results = {}
-
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        for coin, pair in symbol_map.items():
-            async with session.get(base_url, params={"symbol": pair}) as resp:
-                if resp.status != 200:
-                    text = await resp.text()
-                    raise RuntimeError(f"Binance API 錯誤：{resp.status} {text[:200]}")
-                data = await resp.json()
-                results[coin] = float(data["price"])
+    for coin, pair in BINANCE_SYMBOL_MAP.items():
+        if pair in tickers:
+            results[coin] = float(tickers[pair]["price"])
 
     return results
 
 
-async def fetch_24h_ticker_stats():
-    url = "https://data-api.binance.vision/api/v3/ticker/24hr"
-    symbol_map = {
-        "BTC": "BTCUSDT",
-        "ETH": "ETHUSDT",
-        "BNB": "BNBUSDT",
-    }
+async def fetch_24h_ticker_stats(symbols: list[str] | None = None):
+    symbols = symbols or list(BINANCE_SYMBOL_MAP)
+    pairs = [BINANCE_SYMBOL_MAP[symbol] for symbol in symbols]
+    tickers = await fetch_binance_tickers("ticker/24hr", pairs, "Binance 24hr API")
 
-    timeout = aiohttp.ClientTimeout(total=15)
     result = {}
-
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        for key, symbol in symbol_map.items():
-            async with session.get(url, params={"symbol": symbol}) as resp:
-                if resp.status != 200:
-                    text = await resp.text()
-                    raise RuntimeError(f"Binance 24hr API 錯誤：{resp.status} {text[:200]}")
-                item = await resp.json()
-
-            result[key] = {
-                "lastPrice": float(item["lastPrice"]),
-                "priceChangePercent": float(item["priceChangePercent"]),
-                "highPrice": float(item["highPrice"]),
-                "lowPrice": float(item["lowPrice"]),
-            }
+    for key, pair in zip(symbols, pairs):
+        item = tickers.get(pair)
+        if item is None:
+            continue
+        result[key] = {
+            "lastPrice": float(item["lastPrice"]),
+            "priceChangePercent": float(item["priceChangePercent"]),
+            "highPrice": float(item["highPrice"]),
+            "lowPrice": float(item["lowPrice"]),
+        }
 
     return result
 
 
+# =========================
+# 價格快取：TTL + single-flight（同時間多個呼叫只會打一次 API）
+# =========================
+
+PRICE_CACHE_TTL_SECONDS = float(os.getenv("PRICE_CACHE_TTL_SECONDS", "10"))
+# 超過 TTL 但還在這個時間內的資料，會先回舊資料、同時在背景更新
+PRICE_CACHE_STALE_SECONDS = float(os.getenv("PRICE_CACHE_STALE_SECONDS", "120"))
+TICKER_24H_CACHE_TTL_SECONDS = float(os.getenv("TICKER_24H_CACHE_TTL_SECONDS", "60"))
+TICKER_24H_CACHE_STALE_SECONDS = float(os.getenv("TICKER_24H_CACHE_STALE_SECONDS", "600"))
+
+
+class RefreshingCache:
+    def __init__(self, name: str, fetcher, ttl_seconds: float, stale_seconds: float):
+        self.name = name
+        self.fetcher = fetcher
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = max(stale_seconds, ttl_seconds)
+        self.value = None
+        self.fetched_at: float | None = None
+        self._inflight: asyncio.Task | None = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.fetches = 0
+
+    def age(self) -> float | None:
+        if self.fetched_at is None:
+            return None
+        return time.monotonic() - self.fetched_at
+
+    def put(self, value):
+        self.value = value
+        self.fetched_at = time.monotonic()
+
+    async def _fetch(self):
+        self.fetches += 1
+        value = await self.fetcher()
+        self.put(value)
+        return value
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._fetch())
+            self._inflight.add_done_callback(self._log_failure)
+        return self._inflight
+
+    def _log_failure(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[cache] {self.name} 更新失敗：{task.exception()}", flush=True)
+
+    async def refresh(self):
+        # 強制更新；若已有進行中的請求就一起等它
+        return await asyncio.shield(self._start_refresh())
+
+    async def get(self) -> tuple[object, float]:
+        # 回傳 (資料, 資料年齡秒數)
+        age = self.age()
+        if age is not None and age <= self.ttl_seconds:
+            self.hits += 1
+            return self.value, age
+
+        if age is not None and age <= self.stale_seconds:
+            self.stale_hits += 1
+            self._start_refresh()
+            return self.value, age
+
+        self.misses += 1
+        value = await self.refresh()
+        return value, self.age() or 0.0
+
+    def format_stats(self) -> str:
+        age = self.age()
+        age_text = f"{age:.0f}s" if age is not None else "-"
+        return (
+            f"hits={self.hits} stale={self.stale_hits} misses={self.misses} "
+            f"fetches={self.fetches} age={age_text}"
+        )
+
+
+price_cache = RefreshingCache("price", fetch_crypto_prices, PRICE_CACHE_TTL_SECONDS, PRICE_CACHE_STALE_SECONDS)
+ticker_24h_cache = RefreshingCache(
+    "24h",
+    lambda: fetch_24h_ticker_stats(DAILY_SUMMARY_SYMBOLS),
+    TICKER_24H_CACHE_TTL_SECONDS,
+    TICKER_24H_CACHE_STALE_SECONDS,
+)
+
+
+def format_data_age(age: float) -> str:
+    if age < 60:
+        return f"{age:.0f} 秒前"
+    return f"{age / 60:.0f} 分鐘前"
+
+
 def format_daily_summary_line(symbol: str, stats: dict) -> str:
     last_price = fmt_price_compact(symbol, stats["lastPrice"])
     pct = stats["priceChangePercent"]
@@ -238,85 +1068,467 @@ def format_daily_summary_line(symbol: str, stats: dict) -> str:
     return f"{symbol}：{last_price}（24h {pct_str}，高：{high_price} / 低：{low_price}）"
 
 
-async def fetch_rss_articles(feed_url: str):
-    timeout = aiohttp.ClientTimeout(total=15)
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        async with session.get(feed_url) as resp:
-            if resp.status != 200:
-                return []
-            text = await resp.text()
+# =========================
+# 新聞 RSS 快取：ETag / Last-Modified 條件請求 + 已解析文章（落地保存）
+# =========================
 
-    try:
-        root = ET.fromstring(text)
-    except Exception:
-        return []
-
-    articles = []
-    for item in root.findall(".//item"):
-        title = (item.findtext("title") or "").strip()
-        link = (item.findtext("link") or "").strip()
-        pub_date_text = (item.findtext("pubDate") or "").strip()
-        description = (item.findtext("description") or "").strip()
-
-        if not title or not link:
-            continue
+NEWS_CACHE_PATH = os.getenv("NEWS_CACHE_PATH", "news_cache.json")
+NEWS_POLL_INTERVAL_SECONDS = float(os.getenv("NEWS_POLL_INTERVAL_SECONDS", "900"))
+
+
+# 只保留這麼多小時內的新聞
+NEWS_MAX_AGE_HOURS = 24
+# 連續這麼多篇都早於截止時間，就當作後面都是舊文章（feed 依時間排序），不再往下解析
+RSS_STOP_AFTER_OLD_ITEMS = 3
+RSS_CHUNK_SIZE = 16 * 1024
+
+
+def _article_from_item(item: ET.Element) -> dict | None:
+    title = (item.findtext("title") or "").strip()
+    link = (item.findtext("link") or "").strip()
+    pub_date_text = (item.findtext("pubDate") or "").strip()
+    description = (item.findtext("description") or "").strip()
 
-        pub_dt = None
-        if pub_date_text:
+    if not title or not link:
+        return None
+
+    pub_dt = None
+    if pub_date_text:
+        try:
+            pub_dt = parsedate_to_datetime(pub_date_text)
+            if pub_dt.tzinfo is None:
+                pub_dt = pub_dt.replace(tzinfo=datetime.timezone.utc)
+        except Exception:
+            pub_dt = None
+
+    return {
+        "title": title,
+        "link": link,
+        "description": description,
+        "published_at": pub_dt,
+    }
+
+
+class RssStreamParser:
+    # 邊收邊解析：每篇 <item> 解析完就清掉，遇到一串過期文章就提早停止
+    def __init__(self, cutoff: datetime.datetime):
+        self.cutoff = cutoff
+        self.articles: list[dict] = []
+        self.done = False
+        # XML 壞掉才算失敗；只是沒有 24 小時內的文章不算
+        self.failed = False
+        self._parser = ET.XMLPullParser(events=("end",))
+        self._old_streak = 0
+
+    def feed(self, chunk: bytes):
+        if self.done:
+            return
+        try:
+            self._parser.feed(chunk)
+            events = self._parser.read_events()
+            for _, elem in events:
+                if elem.tag != "item":
+                    continue
+                article = _article_from_item(elem)
+                elem.clear()
+                if article is None:
+                    continue
+
+                pub_dt = article["published_at"]
+                if pub_dt is not None and pub_dt < self.cutoff:
+                    self._old_streak += 1
+                    if self._old_streak >= RSS_STOP_AFTER_OLD_ITEMS:
+                        self.done = True
+                        return
+                    continue
+
+                self._old_streak = 0
+                self.articles.append(article)
+        except ET.ParseError as e:
+            print(f"[news] RSS 解析失敗：{e}", flush=True)
+            self.done = True
+            self.failed = True
+
+    def close(self) -> list[dict]:
+        if not self.done:
             try:
-                pub_dt = parsedate_to_datetime(pub_date_text)
-                if pub_dt.tzinfo is None:
-                    pub_dt = pub_dt.replace(tzinfo=datetime.timezone.utc)
-            except Exception:
-                pub_dt = None
-
-        articles.append({
-            "title": title,
-            "link": link,
-            "description": description,
-            "published_at": pub_dt,
-        })
+                self._parser.close()
+            except ET.ParseError as e:
+                print(f"[news] RSS 解析失敗：{e}", flush=True)
+                self.failed = True
+        return self.articles
+
+
+class FeedCache:
+    def __init__(self, path: str):
+        self.path = path
+        # feed url -> {"etag", "last_modified", "articles", "fetched_at"}
+        self.entries: dict[str, dict] = {}
+        self.not_modified = 0
+        self.downloads = 0
+
+    def has(self, feed_url: str) -> bool:
+        return feed_url in self.entries
+
+    def articles(self, feed_url: str) -> list[dict]:
+        entry = self.entries.get(feed_url)
+        return entry["articles"] if entry else []
+
+    def conditional_headers(self, feed_url: str) -> dict:
+        entry = self.entries.get(feed_url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def mark_not_modified(self, feed_url: str):
+        self.not_modified += 1
+        self.entries[feed_url]["fetched_at"] = time.time()
+
+    def store(self, feed_url: str, articles: list[dict], etag: str | None, last_modified: str | None):
+        self.downloads += 1
+        self.entries[feed_url] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "articles": articles,
+            "fetched_at": time.time(),
+        }
+
+    def _serialize(self) -> str:
+        data = {}
+        for url, entry in self.entries.items():
+            data[url] = dict(entry, articles=[
+                dict(a, published_at=a["published_at"].isoformat() if a["published_at"] else None)
+                for a in entry["articles"]
+            ])
+        return json.dumps(data, ensure_ascii=False)
+
+    def _write(self, payload: str):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, self.path)
+
+    async def save(self):
+        payload = self._serialize()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, payload)
+        except Exception as e:
+            print(f"[news] 寫入快取失敗：{e}", flush=True)
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"[news] 讀取快取失敗：{e}", flush=True)
+            return
+
+        for url, entry in data.items():
+            for article in entry["articles"]:
+                if article["published_at"]:
+                    article["published_at"] = datetime.datetime.fromisoformat(article["published_at"])
+            self.entries[url] = entry
+        print(f"[news] 已載入 {len(self.entries)} 個 feed 的快取", flush=True)
+
+    def format_stats(self) -> str:
+        return f"feeds={len(self.entries)} downloads={self.downloads} not_modified={self.not_modified}"
+
+
+feed_cache = FeedCache(NEWS_CACHE_PATH)
 
+
+async def fetch_rss_articles(feed_url: str):
+    headers = feed_cache.conditional_headers(feed_url)
+    async with http_client.get(feed_url, "rss", headers=headers) as resp:
+        if resp.status == 304 and feed_cache.has(feed_url):
+            feed_cache.mark_not_modified(feed_url)
+            return feed_cache.articles(feed_url)
+        if resp.status != 200:
+            return feed_cache.articles(feed_url)
+
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=NEWS_MAX_AGE_HOURS)
+        parser = RssStreamParser(cutoff)
+        async for chunk in resp.content.iter_chunked(RSS_CHUNK_SIZE):
+            parser.feed(chunk)
+            if parser.done:
+                break
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+
+    articles = parser.close()
+    if parser.failed:
+        # 解析失敗時不記 ETag，下次重新下載；正常但沒有新文章的 feed 照樣走條件請求
+        etag = last_modified = None
+    feed_cache.store(feed_url, articles, etag, last_modified)
     return articles
 
 
+async def fetch_feeds_concurrently(feed_urls: list[str], deadline: float = NEWS_FETCH_DEADLINE_SECONDS):
+    # 回傳 (url -> 文章, 逾時的 url, 失敗的 url)；逾時的請求會被取消，不會拖住呼叫端
+    if not feed_urls:
+        return {}, [], []
+
+    tasks = {asyncio.create_task(fetch_rss_articles(url)): url for url in feed_urls}
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+
+    for task in pending:
+        task.cancel()
+
+    results: dict[str, list[dict]] = {}
+    failed = []
+    for task in done:
+        url = tasks[task]
+        if task.exception() is not None:
+            print(f"[news] 抓取 {url} 失敗：{task.exception()}", flush=True)
+            failed.append(url)
+        else:
+            results[url] = task.result()
+
+    late = [tasks[task] for task in pending]
+    if late:
+        print(f"[news] {len(late)} 個 feed 超過 {deadline:.0f} 秒被放棄：{', '.join(late)}", flush=True)
+
+    return results, late, failed
+
+
+async def refresh_news_feeds():
+    await fetch_feeds_concurrently(NEWS_FEEDS)
+    await feed_cache.save()
+
+
+async def news_poll_task():
+    await bot.wait_until_ready()
+    print(f"[news] RSS 輪詢啟動（每 {NEWS_POLL_INTERVAL_SECONDS:.0f} 秒）", flush=True)
+
+    while not bot.is_closed():
+        await refresh_news_feeds()
+        await asyncio.sleep(NEWS_POLL_INTERVAL_SECONDS)
+
+
+class KeywordMatcher:
+    # 所有關鍵字編成一個整字比對的 regex，一次掃過「標題 + 內文」就能算完分數
+    def __init__(self, weights: dict[str, int], title_weights: dict[str, int]):
+        self.weights = weights
+        self.title_weights = title_weights
+        terms = sorted(set(weights) | set(title_weights), key=len, reverse=True)
+        self._pattern = None
+        if terms:
+            alternation = "|".join(re.escape(term).replace(r"\ ", r"\s+") for term in terms)
+            self._pattern = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)", re.IGNORECASE)
+
+    def score(self, title: str, description: str) -> int:
+        if self._pattern is None:
+            return 0
+
+        text = f"{title} {description}"
+        title_end = len(title)
+        matched: set[str] = set()
+        matched_in_title: set[str] = set()
+        for m in self._pattern.finditer(text):
+            keyword = " ".join(m.group(0).lower().split())
+            matched.add(keyword)
+            if m.start() < title_end:
+                matched_in_title.add(keyword)
+
+        return (
+            sum(self.weights.get(k, 0) for k in matched)
+            + sum(self.title_weights.get(k, 0) for k in matched_in_title)
+        )
+
+
+news_keyword_matcher = KeywordMatcher(NEWS_KEYWORD_WEIGHTS, NEWS_TITLE_KEYWORD_WEIGHTS)
+
+
 def score_article(article: dict) -> int:
-    text = f"{article['title']} {article['description']}".lower()
-    score = 0
+    return news_keyword_matcher.score(article["title"], article["description"])
+
+
+# =========================
+# 新聞去重：MinHash + LSH 找近似重複標題，已發過的新聞落地保存
+# =========================
+
+NEWS_SEEN_PATH = os.getenv("NEWS_SEEN_PATH", "news_seen.json")
+NEWS_SEEN_MAX_AGE_DAYS = float(os.getenv("NEWS_SEEN_MAX_AGE_DAYS", "7"))
+NEWS_SEEN_MAX_ENTRIES = 2000
+# 估計的 Jaccard 相似度超過這個值就當作同一則新聞
+NEWS_DUP_SIMILARITY = float(os.getenv("NEWS_DUP_SIMILARITY", "0.4"))
+
+MINHASH_PERMUTATIONS = 32
+MINHASH_BAND_ROWS = 2
+_MINHASH_PRIME = (1 << 61) - 1
+_minhash_rng = random.Random(20260321)
+_MINHASH_PARAMS = [
+    (_minhash_rng.randrange(1, _MINHASH_PRIME), _minhash_rng.randrange(0, _MINHASH_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+NEWS_STOPWORDS = {
+    "a", "an", "the", "to", "of", "in", "on", "for", "and", "or", "as", "is", "are",
+    "at", "by", "with", "after", "amid", "from", "its", "it", "this", "that", "be",
+}
+
+
+def normalize_news_link(link: str) -> str:
+    parts = urllib.parse.urlsplit(link.strip())
+    return f"{parts.netloc.lower()}{parts.path.rstrip('/')}"
+
+
+def title_shingles(title: str) -> set[str]:
+    tokens = [t for t in re.findall(r"\w+", title.lower()) if t not in NEWS_STOPWORDS]
+    return set(tokens) | {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
 
-    for kw in NEWS_KEYWORDS:
-        if kw in text:
-            score += 2
 
-    title_lower = article["title"].lower()
-    for strong_kw in ["bitcoin", "btc", "ethereum", "eth", "binance", "etf", "sec", "hack"]:
-        if strong_kw in title_lower:
-            score += 2
+def minhash_signature(title: str) -> tuple[int, ...]:
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+        for s in title_shingles(title)
+    ]
+    if not hashes:
+        return ()
+    return tuple(min((a * h + b) % _MINHASH_PRIME for h in hashes) for a, b in _MINHASH_PARAMS)
+
+
+def signature_similarity(sig_a: tuple[int, ...], sig_b: tuple[int, ...]) -> float:
+    if not sig_a or not sig_b:
+        return 0.0
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class SeenNewsIndex:
+    # link 直接查 dict；標題簽名切成數段（LSH band），同一段相同的才拿來比對相似度
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self._next_id = 0
+        # id -> {"link", "signature", "posted_at"}，插入順序 = 時間順序
+        self.entries: dict[int, dict] = {}
+        self._links: dict[str, int] = {}
+        self._bands: dict[tuple[int, tuple[int, ...]], set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def _band_keys(signature: tuple[int, ...]):
+        for start in range(0, len(signature), MINHASH_BAND_ROWS):
+            yield start, signature[start:start + MINHASH_BAND_ROWS]
+
+    def is_duplicate(self, article: dict) -> bool:
+        if normalize_news_link(article["link"]) in self._links:
+            return True
+
+        signature = article.get("signature") or minhash_signature(article["title"])
+        article["signature"] = signature
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates |= self._bands.get(key, set())
+        return any(
+            signature_similarity(signature, self.entries[i]["signature"]) >= NEWS_DUP_SIMILARITY
+            for i in candidates
+        )
+
+    def add(self, article: dict, posted_at: float | None = None):
+        signature = article.get("signature") or minhash_signature(article["title"])
+        entry_id = self._next_id
+        self._next_id += 1
+
+        link = normalize_news_link(article["link"])
+        self.entries[entry_id] = {
+            "link": link,
+            "signature": signature,
+            "posted_at": posted_at if posted_at is not None else time.time(),
+        }
+        self._links[link] = entry_id
+        for key in self._band_keys(signature):
+            self._bands.setdefault(key, set()).add(entry_id)
+
+    def _remove(self, entry_id: int):
+        entry = self.entries.pop(entry_id)
+        if self._links.get(entry["link"]) == entry_id:
+            del self._links[entry["link"]]
+        for key in self._band_keys(entry["signature"]):
+            ids = self._bands.get(key)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._bands[key]
+
+    def evict(self, now: float | None = None):
+        cutoff = (now if now is not None else time.time()) - NEWS_SEEN_MAX_AGE_DAYS * 86400
+        while self.entries:
+            oldest_id = next(iter(self.entries))
+            entry = self.entries[oldest_id]
+            if entry["posted_at"] >= cutoff and len(self.entries) <= NEWS_SEEN_MAX_ENTRIES:
+                break
+            self._remove(oldest_id)
+
+    def load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"[news] 讀取已發新聞紀錄失敗：{e}", flush=True)
+            return
+
+        for entry in data:
+            self.add({"link": entry["link"], "title": "", "signature": tuple(entry["signature"])}, entry["posted_at"])
+        self.evict()
+        print(f"[news] 已載入 {len(self.entries)} 筆已發新聞紀錄", flush=True)
+
+    def _write(self, payload: str):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, self.path)
+
+    async def save(self):
+        if self.path is None:
+            return
+        payload = json.dumps([
+            {"link": e["link"], "signature": list(e["signature"]), "posted_at": e["posted_at"]}
+            for e in self.entries.values()
+        ])
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, payload)
+        except Exception as e:
+            print(f"[news] 寫入已發新聞紀錄失敗：{e}", flush=True)
 
-    return score
+
+seen_news = SeenNewsIndex(NEWS_SEEN_PATH)
+
+
+async def record_posted_news(articles: list[dict]):
+    for article in articles:
+        seen_news.add(article)
+    seen_news.evict()
+    await seen_news.save()
 
 
 async def get_top_crypto_news(limit: int = 2):
     all_articles = []
     now_utc = datetime.datetime.now(datetime.timezone.utc)
-    cutoff = now_utc - datetime.timedelta(hours=24)
+    cutoff = now_utc - datetime.timedelta(hours=NEWS_MAX_AGE_HOURS)
+
+    # 平常只讀輪詢任務更新好的快取；只有從沒抓過的 feed 才會在這裡（同時、限時）連網
+    await fetch_feeds_concurrently([url for url in NEWS_FEEDS if not feed_cache.has(url)])
 
     for feed_url in NEWS_FEEDS:
-        articles = await fetch_rss_articles(feed_url)
-        for article in articles:
+        for article in feed_cache.articles(feed_url):
             pub_dt = article["published_at"]
             if pub_dt is not None and pub_dt < cutoff:
                 continue
-            all_articles.append(article)
+            all_articles.append(dict(article))
 
-    dedup = {}
-    for article in all_articles:
-        key = article["title"].strip().lower()
-        if key not in dedup:
-            dedup[key] = article
-
-    scored = list(dedup.values())
-    scored.sort(
+    all_articles.sort(
         key=lambda a: (
             score_article(a),
             a["published_at"].timestamp() if a["published_at"] else 0
@@ -324,20 +1536,38 @@ async def get_top_crypto_news(limit: int = 2):
         reverse=True
     )
 
-    return scored[:limit]
+    # 分數高的先挑；跟之前發過的、或這次已挑中的近似重複就跳過
+    picked = SeenNewsIndex()
+    result = []
+    for article in all_articles:
+        if seen_news.is_duplicate(article) or picked.is_duplicate(article):
+            continue
+        picked.add(article)
+        result.append(article)
+        if len(result) >= limit:
+            break
 
+    return result
 
-async def build_daily_summary_message(now_dt: datetime.datetime) -> str:
-    stats = await fetch_24h_ticker_stats()
-    news_items = await get_top_crypto_news(limit=2)
 
-    lines = [
-        f"📊 每日幣圈摘要（{now_dt.month:02d}/{now_dt.day:02d} {now_dt.hour:02d}:{now_dt.minute:02d}）",
-        "",
-        format_daily_summary_line("BTC", stats["BTC"]),
-        format_daily_summary_line("ETH", stats["ETH"]),
-        format_daily_summary_line("BNB", stats["BNB"]),
-    ]
+# =========================
+# 每日摘要：目標時間前先預熱新聞排序與 24h 統計，發送時只再刷新一次行情
+# =========================
+
+DAILY_SUMMARY_PREWARM_SECONDS = float(os.getenv("DAILY_SUMMARY_PREWARM_SECONDS", "300"))
+DAILY_SUMMARY_REFRESH_TIMEOUT_SECONDS = float(os.getenv("DAILY_SUMMARY_REFRESH_TIMEOUT_SECONDS", "5"))
+
+
+def format_daily_summary(now_dt: datetime.datetime, stats: dict, stats_age: float, news_items: list[dict]) -> str:
+    header = f"📊 每日幣圈摘要（{now_dt.month:02d}/{now_dt.day:02d} {now_dt.hour:02d}:{now_dt.minute:02d}）"
+    lines = [header, ""]
+    for symbol in DAILY_SUMMARY_SYMBOLS:
+        if symbol in stats:
+            lines.append(format_daily_summary_line(symbol, stats[symbol]))
+
+    # 行情不是剛抓的（即時更新失敗、或測試指令直接用快取）就標出資料時間
+    if stats_age > TICKER_24H_CACHE_TTL_SECONDS:
+        lines.append(f"（行情資料更新於 {format_data_age(stats_age)}）")
 
     if news_items:
         lines.append("")
@@ -349,163 +1579,485 @@ async def build_daily_summary_message(now_dt: datetime.datetime) -> str:
     return "\n".join(lines)
 
 
-async def check_percent_alerts(channel: discord.TextChannel, symbol: str, now: datetime.datetime, current_price: float):
-    history = price_history[symbol]
-    if not history:
-        return
+class DailySummaryPipeline:
+    def __init__(self):
+        # 新聞排序結果（已去重）與計算時間
+        self.news_items: list[dict] | None = None
+        self.news_at: float | None = None
+        self.prewarms = 0
+        self.fallbacks = 0
+
+    def news_age(self) -> float | None:
+        if self.news_at is None:
+            return None
+        return time.monotonic() - self.news_at
+
+    async def rank_news(self) -> list[dict]:
+        self.news_items = await get_top_crypto_news(limit=2)
+        self.news_at = time.monotonic()
+        return self.news_items
+
+    async def news(self) -> list[dict]:
+        age = self.news_age()
+        if age is not None and age <= NEWS_POLL_INTERVAL_SECONDS:
+            return self.news_items
+        return await self.rank_news()
+
+    async def prewarm(self):
+        self.prewarms += 1
+        started = time.monotonic()
+
+        results = await asyncio.gather(
+            refresh_news_feeds(),
+            ticker_24h_cache.refresh(),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"[daily-summary] 預熱失敗：{result}", flush=True)
+
+        await self.rank_news()
+        print(
+            f"[daily-summary] 預熱完成（{time.monotonic() - started:.1f}s，新聞 {len(self.news_items)} 則）",
+            flush=True
+        )
 
-    price_15m = None
-    target_15m = now - datetime.timedelta(minutes=15)
-    for ts, price in history:
-        if ts <= target_15m:
-            price_15m = price
-        else:
-            break
+    async def stats(self, refresh: bool) -> tuple[dict, float]:
+        if refresh:
+            try:
+                await asyncio.wait_for(ticker_24h_cache.refresh(), DAILY_SUMMARY_REFRESH_TIMEOUT_SECONDS)
+            except Exception as e:
+                self.fallbacks += 1
+                print(f"[daily-summary] 行情更新失敗，改用上次資料：{e!r}", flush=True)
 
-    price_1h = None
-    target_1h = now - datetime.timedelta(hours=1)
-    for ts, price in history:
-        if ts <= target_1h:
-            price_1h = price
-        else:
-            break
+        # 更新失敗時快取仍保留上一次成功的資料
+        if ticker_24h_cache.value is not None:
+            return ticker_24h_cache.value, ticker_24h_cache.age()
+        return await ticker_24h_cache.get()
 
-    if price_15m is not None:
-        change_15m = pct_change(price_15m, current_price)
+    async def build(self, now_dt: datetime.datetime, refresh: bool = True) -> tuple[str, list[dict]]:
+        news_items = await self.news()
+        stats, stats_age = await self.stats(refresh)
+        return format_daily_summary(now_dt, stats, stats_age, news_items), news_items
 
-        if change_15m >= 1.0:
-            key = "15m_up"
-            if should_send_cooldown(last_percent_alert_at[symbol][key], now, 15):
-                await channel.send(
-                    f"🚨 {symbol} 劇烈波動提醒\n"
-                    f"目前價格：{fmt_price(symbol, current_price)}\n"
-                    f"15 分鐘內上漲：+{change_15m:.2f}%"
-                )
-                last_percent_alert_at[symbol][key] = now
+    def format_stats(self) -> str:
+        age = self.news_age()
+        age_text = f"{age:.0f}s" if age is not None else "-"
+        return f"prewarms={self.prewarms} fallbacks={self.fallbacks} news_age={age_text}"
 
-        elif change_15m <= -1.0:
-            key = "15m_down"
-            if should_send_cooldown(last_percent_alert_at[symbol][key], now, 15):
-                await channel.send(
-                    f"🚨 {symbol} 劇烈波動提醒\n"
-                    f"目前價格：{fmt_price(symbol, current_price)}\n"
-                    f"15 分鐘內下跌：{change_15m:.2f}%"
-                )
-                last_percent_alert_at[symbol][key] = now
 
-    if price_1h is not None:
-        change_1h = pct_change(price_1h, current_price)
+daily_summary = DailySummaryPipeline()
+
+
+# =========================
+# 提醒合併發送：同一輪（或 debounce 時間內）的提醒盡量塞進同一則訊息
+# =========================
+
+DISCORD_MESSAGE_LIMIT = 2000
+# 0 = 每輪評估結束就送；> 0 = 等這麼多秒把後續幾輪的提醒一起送
+ALERT_DEBOUNCE_SECONDS = float(os.getenv("ALERT_DEBOUNCE_SECONDS", "0"))
+
+
+class AlertBatch:
+    def __init__(self):
+        # (內容, 是否需要 @everyone)
+        self.items: list[tuple[str, bool]] = []
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def add(self, text: str, mention_everyone: bool = False):
+        self.items.append((text, mention_everyone))
+
+    def extend(self, other: "AlertBatch"):
+        self.items.extend(other.items)
+
+    def render(self, limit: int = DISCORD_MESSAGE_LIMIT) -> list[tuple[str, bool]]:
+        # 需要 @everyone 的提醒自成一組、排在前面，其餘提醒不帶任何 mention
+        messages = []
+        for mention in (True, False):
+            prefix = "@everyone " if mention else ""
+            current = prefix
+            for text, needs_mention in self.items:
+                if needs_mention != mention:
+                    continue
+                text = text[:limit - len(prefix)]
+                sep = "\n\n" if current != prefix else ""
+                if len(current) + len(sep) + len(text) > limit:
+                    messages.append((current, mention))
+                    current, sep = prefix, ""
+                current += sep + text
+            if current != prefix:
+                messages.append((current, mention))
+        return messages
+
+
+class AlertDispatcher:
+    def __init__(self, debounce_seconds: float):
+        self.debounce_seconds = debounce_seconds
+        self._pending = AlertBatch()
+        self._channel: discord.TextChannel | None = None
+        self._flush_task: asyncio.Task | None = None
+        self.alerts_sent = 0
+        self.messages_sent = 0
+
+    async def submit(self, channel: discord.TextChannel, batch: AlertBatch):
+        if not len(batch):
+            return
+        self._channel = channel
+        self._pending.extend(batch)
+        if self.debounce_seconds <= 0:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.debounce_seconds)
+        await self.flush()
+
+    async def flush(self):
+        batch, self._pending = self._pending, AlertBatch()
+        if not len(batch) or self._channel is None:
+            return
+
+        sends = []
+        for content, mention in batch.render():
+            if mention:
+                sends.append(outbound.send(
+                    self._channel, content, priority=PRIORITY_CRITICAL, allowed_mentions=_allowed_mentions_all()
+                ))
+            else:
+                sends.append(outbound.send(
+                    self._channel, content, priority=PRIORITY_ALERT, allowed_mentions=discord.AllowedMentions.none()
+                ))
+
+        for result in await asyncio.gather(*sends, return_exceptions=True):
+            if isinstance(result, Exception):
+                print(f"[crypto] 發送提醒失敗：{result}", flush=True)
+            elif result is not None:
+                self.messages_sent += 1
+        self.alerts_sent += len(batch)
+
+    def format_stats(self) -> str:
+        return f"alerts={self.alerts_sent} messages={self.messages_sent} pending={len(self._pending)}"
+
+
+alert_dispatcher = AlertDispatcher(ALERT_DEBOUNCE_SECONDS)
 
-        if change_1h >= 2.0:
-            key = "1h_up"
-            if should_send_cooldown(last_percent_alert_at[symbol][key], now, 30):
-                await channel.send(
-                    f"🚨 {symbol} 劇烈波動提醒\n"
-                    f"目前價格：{fmt_price(symbol, current_price)}\n"
-                    f"1 小時內上漲：+{change_1h:.2f}%"
-                )
-                last_percent_alert_at[symbol][key] = now
 
-        elif change_1h <= -2.0:
-            key = "1h_down"
-            if should_send_cooldown(last_percent_alert_at[symbol][key], now, 30):
-                await channel.send(
+def check_percent_alerts(alerts: AlertBatch, now_ts: float, current: np.ndarray) -> bool:
+    # 回傳這輪有沒有更新冷卻時間（需要落地保存）
+    state = watch_state
+    changed = False
+
+    for label, rules in state.window_rules.items():
+        agg = state.windows[label].aggregate()
+        if agg is None:
+            continue
+        first, _, window_high, _, drawdown = agg
+        window_text = format_window(state.windows[label].seconds)
+
+        checks = []
+        if "percent" in rules:
+            thresholds, cooldowns = rules["percent"]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                change = np.where(first != 0, (current - first) / first * 100.0, 0.0)
+            checks.append(("up", change >= thresholds, cooldowns, change))
+            checks.append(("down", change <= -thresholds, cooldowns, change))
+        if "drawdown" in rules:
+            thresholds, cooldowns = rules["drawdown"]
+            drawdown_pct = drawdown * 100.0
+            checks.append(("drawdown", drawdown_pct >= thresholds, cooldowns, drawdown_pct))
+
+        for direction, hit, cooldowns, values in checks:
+            last_at = state.percent_alert_at[f"{label}_{direction}"]
+            ready = np.isnan(last_at) | (now_ts - last_at >= cooldowns)
+            fired = np.flatnonzero(hit & ready)
+
+            for i in fired:
+                symbol = state.symbols[i]
+                if direction == "up":
+                    move_text = f"{window_text}內上漲：+{values[i]:.2f}%"
+                elif direction == "down":
+                    move_text = f"{window_text}內下跌：{values[i]:.2f}%"
+                else:
+                    move_text = (
+                        f"{window_text}內最大回撤：-{values[i]:.2f}%"
+                        f"（區間高點：{fmt_price(symbol, window_high[i])}）"
+                    )
+                alerts.add(
                     f"🚨 {symbol} 劇烈波動提醒\n"
-                    f"目前價格：{fmt_price(symbol, current_price)}\n"
-                    f"1 小時內下跌：{change_1h:.2f}%"
+                    f"目前價格：{fmt_price(symbol, current[i])}\n"
+                    f"{move_text}"
                 )
-                last_percent_alert_at[symbol][key] = now
 
+            last_at[fired] = now_ts
+            changed = changed or len(fired) > 0
 
-async def check_breakout_alerts(channel: discord.TextChannel, symbol: str, current_price: float):
-    if symbol == "BTC":
-        step = 1000
-    elif symbol == "ETH":
-        step = 100
-    else:
-        return
+    return changed
 
-    current_bucket = get_bucket(current_price, step)
-    previous_bucket = last_price_bucket[symbol]
 
-    if previous_bucket is None:
-        last_price_bucket[symbol] = current_bucket
-        return
+def check_breakout_alerts(alerts: AlertBatch, current: np.ndarray) -> bool:
+    state = watch_state
 
-    if current_bucket > previous_bucket:
-        crossed_price = current_bucket * step
-        await channel.send(f"{symbol}突破 {crossed_price}！📈")
-    elif current_bucket < previous_bucket:
-        crossed_price = previous_bucket * step
-        await channel.send(f"{symbol}跌破{crossed_price}！📉")
+    with np.errstate(invalid="ignore"):
+        current_bucket = np.floor(current / state.breakout_steps)
+    previous_bucket = state.last_bucket
 
-    last_price_bucket[symbol] = current_bucket
+    # 第一次看到（previous 為 NaN）只記錄、不提醒
+    for i in np.flatnonzero(current_bucket > previous_bucket):
+        symbol = state.symbols[i]
+        crossed_price = fmt_level(current_bucket[i] * state.breakout_steps[i])
+        alerts.add(f"{symbol}突破 {crossed_price}！📈")
 
+    for i in np.flatnonzero(current_bucket < previous_bucket):
+        symbol = state.symbols[i]
+        crossed_price = fmt_level(previous_bucket[i] * state.breakout_steps[i])
+        alerts.add(f"{symbol}跌破{crossed_price}！📉")
 
-async def check_custom_price_alerts(channel: discord.TextChannel, symbol: str, current_price: float):
-    prev_price = last_seen_prices[symbol]
-    alerts = custom_price_alerts[symbol]
+    updated = ~np.isnan(current_bucket) & (current_bucket != previous_bucket)
+    np.copyto(state.last_bucket, current_bucket, where=updated)
+    return bool(updated.any())
 
-    if prev_price is None:
-        last_seen_prices[symbol] = current_price
-        return
 
-    for alert in alerts:
-        if alert["triggered"]:
-            continue
+def check_custom_price_alerts(alerts: AlertBatch, current: np.ndarray) -> bool:
+    state = watch_state
 
-        target = alert["price"]
+    for symbol, index in custom_price_alerts.items():
+        if not len(index):
+            continue
 
-        crossed_up = prev_price < target <= current_price
-        crossed_down = prev_price > target >= current_price
+        i = state.index[symbol]
+        prev_price = state.last_seen[i]
+        current_price = current[i]
+        if math.isnan(prev_price) or math.isnan(current_price):
+            continue
 
-        if crossed_up or crossed_down:
-            alert["triggered"] = True
-            await channel.send(
-                f"@everyone 🚨 {symbol} 價格提醒\n"
+        for alert in index.pop_crossed(prev_price, current_price):
+            target = alert["price"]
+            if state_store is not None:
+                state_store.alert_removed(symbol, target)
+            alerts.add(
+                f"🚨 {symbol} 價格提醒\n"
                 f"{symbol} 已觸及你設定的價格：{target:,.2f}\n"
                 f"目前價格：{fmt_price(symbol, current_price)}",
-                allowed_mentions=_allowed_mentions_all(),
+                mention_everyone=True,
             )
 
-    last_seen_prices[symbol] = current_price
+    updated = ~np.isnan(current) & (current != state.last_seen)
+    np.copyto(state.last_seen, current, where=updated)
+    return bool(updated.any())
 
 
-@tasks.loop(minutes=2)
-async def crypto_price_watch_task():
-    await bot.wait_until_ready()
+# 同一時間只讓一個來源（WebSocket 或 REST）跑提醒檢查，避免重複發訊息
+price_tick_lock = asyncio.Lock()
+
 
+async def get_crypto_alert_channel() -> discord.TextChannel | None:
     channel = bot.get_channel(CRYPTO_ALERT_CHANNEL_ID)
     if channel is None:
         try:
             channel = await bot.fetch_channel(CRYPTO_ALERT_CHANNEL_ID)
         except Exception as e:
             print(f"[crypto] 無法取得提醒頻道：{e}", flush=True)
-            return
+            return None
 
     if not isinstance(channel, discord.TextChannel):
         print("[crypto] CRYPTO_ALERT_CHANNEL_ID 不是文字頻道", flush=True)
+        return None
+
+    return channel
+
+
+async def process_price_batch(channel: discord.TextChannel, now: datetime.datetime, prices: dict[str, float]):
+    # 一次評估 = 所有幣種跑一輪向量化檢查；沒有新報價的幣種沿用上一次的價格
+    async with price_tick_lock:
+        state = watch_state
+        for symbol, price in prices.items():
+            i = state.index.get(symbol)
+            if i is not None:
+                state.current[i] = price
+
+        now_ts = now.timestamp()
+        current = state.current.copy()
+        state.push_window_row(now_ts, current)
+
+        alerts = AlertBatch()
+        dirty = []
+        if check_percent_alerts(alerts, now_ts, current):
+            dirty.append("last_percent_alert_at")
+        if check_breakout_alerts(alerts, current):
+            dirty.append("last_price_bucket")
+        if check_custom_price_alerts(alerts, current):
+            dirty.append("last_seen_prices")
+
+        # 只有真的變了的狀態才排進下一次寫入
+        if state_store is not None and dirty:
+            state_store.mark_dirty(*dirty)
+
+        # 所有幣種都有報價時，順便更新價格快取給 !price 用
+        if not np.isnan(current).any():
+            price_cache.put(dict(zip(state.symbols, current.tolist())))
+
+    await alert_dispatcher.submit(channel, alerts)
+
+
+# =========================
+# Binance WebSocket 即時價格串流（REST 輪詢為備援）
+# =========================
+
+BINANCE_WS_URL = "wss://data-stream.binance.vision/stream"
+
+CRYPTO_STREAM_ENABLED = os.getenv("CRYPTO_STREAM_ENABLED", "1") == "1"
+# miniTicker：每秒一筆收盤價；aggTrade：逐筆成交
+CRYPTO_STREAM_KIND = os.getenv("CRYPTO_STREAM_KIND", "miniTicker")
+# 每秒最多跑幾輪提醒檢查（每輪涵蓋所有有新報價的幣種）
+CRYPTO_STREAM_MAX_EVALS_PER_SECOND = float(os.getenv("CRYPTO_STREAM_MAX_EVALS_PER_SECOND", "1"))
+# 超過這麼久沒收到串流資料，就當作串流掛了，改由 REST 輪詢接手
+CRYPTO_STREAM_STALE_SECONDS = 30
+CRYPTO_STREAM_BACKOFF_MAX_SECONDS = 60
+# 一則 SUBSCRIBE 訊息最多帶幾個 stream（幾百個交易對時不能全塞在 URL 裡）
+CRYPTO_STREAM_SUBSCRIBE_CHUNK = 200
+
+
+class BinancePriceStream:
+    def __init__(self, symbol_map: dict[str, str], kind: str, max_evals_per_second: float):
+        self.symbol_map = symbol_map
+        self.kind = kind
+        self.eval_interval = 1.0 / max_evals_per_second if max_evals_per_second > 0 else 1.0
+        self.connected = False
+        self.last_message_at: float | None = None
+        self.messages = 0
+        self.evaluations = 0
+        self.reconnects = 0
+        # 下一次重連前的基準等待秒數：連線成功就重設，失敗一次加倍
+        self.backoff = 1.0
+        self._pair_to_symbol = {pair: symbol for symbol, pair in symbol_map.items()}
+        # 兩次評估之間收到的最新報價；評估迴圈每輪整批取走
+        self._pending: dict[str, float] = {}
+
+    def stream_names(self) -> list[str]:
+        return [f"{pair.lower()}@{self.kind}" for pair in self.symbol_map.values()]
+
+    def is_healthy(self) -> bool:
+        if not self.connected or self.last_message_at is None:
+            return False
+        return time.monotonic() - self.last_message_at < CRYPTO_STREAM_STALE_SECONDS
+
+    def parse_message(self, raw: str) -> tuple[str, float] | None:
+        try:
+            payload = json.loads(raw)
+            data = payload.get("data", payload)
+            pair = data["s"]
+            price = float(data["c"] if "c" in data else data["p"])
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+        symbol = self._pair_to_symbol.get(pair)
+        if symbol is None:
+            return None
+        return symbol, price
+
+    async def _subscribe(self, ws):
+        names = self.stream_names()
+        for i in range(0, len(names), CRYPTO_STREAM_SUBSCRIBE_CHUNK):
+            await ws.send_json({
+                "method": "SUBSCRIBE",
+                "params": names[i:i + CRYPTO_STREAM_SUBSCRIBE_CHUNK],
+                "id": i // CRYPTO_STREAM_SUBSCRIBE_CHUNK + 1,
+            })
+            # Binance 限制每秒最多 5 則控制訊息
+            await asyncio.sleep(0.25)
+
+    async def _consume(self, ws):
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                if msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    break
+                continue
+
+            self.last_message_at = time.monotonic()
+            self.messages += 1
+
+            parsed = self.parse_message(msg.data)
+            if parsed is not None:
+                symbol, price = parsed
+                self._pending[symbol] = price
+
+    async def _evaluate_loop(self):
+        # 節流：每 eval_interval 秒最多評估一輪，每個幣種一輪最多一次
+        while not bot.is_closed():
+            await asyncio.sleep(self.eval_interval)
+            if not self._pending:
+                continue
+
+            channel = await get_crypto_alert_channel()
+            if channel is None:
+                continue
+
+            batch, self._pending = self._pending, {}
+            self.evaluations += 1
+            try:
+                await process_price_batch(channel, datetime.datetime.now(TZ), batch)
+            except Exception as e:
+                print(f"[crypto-ws] 提醒檢查失敗：{e}", flush=True)
+
+    async def run(self):
+        await bot.wait_until_ready()
+        asyncio.create_task(self._evaluate_loop())
+
+        while not bot.is_closed():
+            try:
+                async with http_client.ws_connect(BINANCE_WS_URL, heartbeat=20) as ws:
+                    self.connected = True
+                    self.backoff = 1.0
+                    await self._subscribe(ws)
+                    print(f"[crypto-ws] 已連線：{self.kind} x {len(self.symbol_map)}", flush=True)
+                    await self._consume(ws)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[crypto-ws] 串流錯誤：{e}", flush=True)
+            finally:
+                self.connected = False
+
+            self.reconnects += 1
+            delay = self.backoff * random.uniform(0.5, 1.0)
+            print(f"[crypto-ws] {delay:.1f} 秒後重新連線", flush=True)
+            await asyncio.sleep(delay)
+            self.backoff = min(self.backoff * 2, CRYPTO_STREAM_BACKOFF_MAX_SECONDS)
+
+    def format_stats(self) -> str:
+        return (
+            f"connected={self.connected} healthy={self.is_healthy()} messages={self.messages} "
+            f"evals={self.evaluations} reconnects={self.reconnects}"
+        )
+
+
+price_stream = BinancePriceStream(BINANCE_SYMBOL_MAP, CRYPTO_STREAM_KIND, CRYPTO_STREAM_MAX_EVALS_PER_SECOND)
+
+
+@tasks.loop(minutes=2)
+async def crypto_price_watch_task():
+    await bot.wait_until_ready()
+
+    # 串流正常時由串流負責，REST 輪詢只在串流斷線時接手
+    if CRYPTO_STREAM_ENABLED and price_stream.is_healthy():
+        return
+
+    channel = await get_crypto_alert_channel()
+    if channel is None:
         return
 
     now = datetime.datetime.now(TZ)
 
     try:
-        prices = await fetch_crypto_prices()
+        prices = await price_cache.refresh()
     except Exception as e:
         print(f"[crypto] 抓價格失敗：{e}", flush=True)
         return
 
-    for symbol, current_price in prices.items():
-        history = price_history[symbol]
-        history.append((now, current_price))
-
-        cutoff = now - datetime.timedelta(hours=2)
-        while history and history[0][0] < cutoff:
-            history.pop(0)
-
-        await check_percent_alerts(channel, symbol, now, current_price)
-        await check_breakout_alerts(channel, symbol, current_price)
-        await check_custom_price_alerts(channel, symbol, current_price)
+    await process_price_batch(channel, now, prices)
 
 
 @crypto_price_watch_task.before_loop
@@ -522,6 +2074,48 @@ FFMPEG_OPTIONS = {
     "options": "-vn",
 }
 
+# auto = Opus 直接 copy 給 Discord、其他編碼由 FFmpeg 轉 Opus；pcm = 一律走舊的 PCM 路徑
+AUDIO_PLAYBACK_MODE = os.getenv("AUDIO_PLAYBACK_MODE", "auto").strip().lower()
+audio_path_counts = {"copy": 0, "encode": 0, "probe": 0, "pcm": 0}
+
+
+def _tee_to_cache(options: str | None, cache_path: str) -> str:
+    # discord.py 把自己的 Opus 輸出參數放在 options 前面、最後固定接 pipe:1。
+    # 這裡把那個輸出換成 tee：同一份 Opus 同時送給 Discord、寫進快取檔，只抓一次串流。
+    # 快取檔排第一個，結束時先寫完關檔，Discord 讀到 EOF 時檔案已經完整；寫檔失敗也不影響播放。
+    # 最後那個 pipe:1 變成只 copy、不輸出的 null。
+    tee = f"[f=matroska:onfail=ignore]{cache_path}|[f=opus]pipe:1"
+    return f"{options or ''} -map 0:a:0 -f tee {shlex.quote(tee)} -map 0:a:0 -c:a copy -f null".strip()
+
+
+async def build_audio_source(
+    location: str, codec: str | None = None, cache_path: str | None = None, **ffmpeg_options
+) -> discord.AudioSource:
+    # PCM 路徑要 FFmpeg 解碼、再由 discord.py 每 20ms 編一次 Opus；Opus 來源直接 copy 就省掉兩次轉碼
+    if AUDIO_PLAYBACK_MODE == "pcm":
+        audio_path_counts["pcm"] += 1
+        return discord.FFmpegPCMAudio(location, **ffmpeg_options)
+
+    if cache_path is not None:
+        ffmpeg_options["options"] = _tee_to_cache(ffmpeg_options.get("options"), cache_path)
+
+    if codec is None:
+        # 不知道編碼（例如上傳的檔案）就先用 ffprobe 看一下
+        audio_path_counts["probe"] += 1
+        return await discord.FFmpegOpusAudio.from_probe(location, **ffmpeg_options)
+
+    if codec.lower().startswith("opus"):
+        audio_path_counts["copy"] += 1
+        return discord.FFmpegOpusAudio(location, codec="copy", **ffmpeg_options)
+
+    audio_path_counts["encode"] += 1
+    return discord.FFmpegOpusAudio(location, **ffmpeg_options)
+
+
+def format_audio_path_stats() -> str:
+    counts = " ".join(f"{k}={v}" for k, v in audio_path_counts.items())
+    return f"mode={AUDIO_PLAYBACK_MODE} {counts}"
+
 
 def ensure_cookies_file() -> Optional[str]:
     b64 = os.getenv("YT_COOKIES_B64")
@@ -540,81 +2134,272 @@ def ensure_cookies_file() -> Optional[str]:
         return None
 
 
-def build_ytdlp_options():
-    cookies_path = ensure_cookies_file()
-
-    opts = {
-        "format": "bestaudio/best",
-        "noplaylist": True,
-        "quiet": True,
-        "nocheckcertificate": True,
-        "cachedir": False,
-        "force_ipv4": True,
-        "extractor_args": {
-            "youtube": {
-                "player_client": ["ios", "default"],
-            }
-        },
-        "http_headers": {
-            "User-Agent": (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/124.0.0.0 Safari/537.36"
-            )
-        },
-    }
+# =========================
+# yt-dlp 解析服務：常駐的 process pool，每個 worker 只初始化一次 yt-dlp 與 cookies
+# =========================
 
-    if cookies_path:
-        opts["cookiefile"] = cookies_path
-    else:
-        print("[yt] WARNING: cookiefile not available -> likely to get 'not a bot' error", flush=True)
+YT_WORKERS = int(os.getenv("YT_WORKERS", "2"))
+# 每個 worker 處理這麼多首之後換新的行程，避免記憶體越長越大
+YT_WORKER_MAX_JOBS = int(os.getenv("YT_WORKER_MAX_JOBS", "50"))
+YT_EXTRACT_TIMEOUT_SECONDS = float(os.getenv("YT_EXTRACT_TIMEOUT_SECONDS", "45"))
+YT_EXTRACT_CONCURRENCY = int(os.getenv("YT_EXTRACT_CONCURRENCY", str(YT_WORKERS)))
+
+
+class ExtractionService:
+    def __init__(self, workers: int, max_jobs_per_worker: int, timeout: float, concurrency: int):
+        self.workers = workers
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.timeout = timeout
+        self._sem = asyncio.Semaphore(concurrency)
+        self._pool: ProcessPoolExecutor | None = None
+        self._cookies_path: str | None = None
+        self.jobs = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.restarts = 0
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # 用 spawn：bot 本身有很多執行緒，fork 出來的子行程可能卡在別人持有的鎖上
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=yt_worker.init_worker,
+            initargs=(self._cookies_path,),
+            max_tasks_per_child=self.max_jobs_per_worker,
+        )
+
+    def start(self):
+        if self._pool is not None:
+            return
+        # cookies 只在這裡解碼、寫檔一次，worker 只讀
+        self._cookies_path = ensure_cookies_file()
+        self._pool = self._new_pool()
+
+    async def warm_up(self):
+        self.start()
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(self._pool, yt_worker.ping) for _ in range(self.workers)),
+            return_exceptions=True
+        )
+        ready = sum(1 for r in results if not isinstance(r, BaseException))
+        print(f"[yt] 解析 worker 預熱完成：{ready}/{self.workers}", flush=True)
+
+    def _restart(self, reason: str, pool: ProcessPoolExecutor):
+        # 同一個 pool 壞掉時其他工作也會一起失敗，只有第一個發現的人負責換
+        if pool is not self._pool:
+            return
+        self._pool = self._new_pool()
+        self.restarts += 1
+        # 卡住的 worker 不會自己結束，直接砍掉；不然行程和舊 pool 的管理執行緒都會一直留著
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False)
+        print(f"[yt] 重建解析 worker（{reason}）", flush=True)
+
+    async def _run(self, fn, *args):
+        self.start()
+        loop = asyncio.get_running_loop()
+
+        async with self._sem:
+            self.jobs += 1
+            for attempt in range(2):
+                pool = self._pool
+                try:
+                    return await asyncio.wait_for(
+                        loop.run_in_executor(pool, fn, *args),
+                        self.timeout
+                    )
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    self._restart("timeout", pool)
+                    raise RuntimeError(f"解析逾時（超過 {self.timeout:.0f} 秒）")
+                except BrokenProcessPool:
+                    # 別的工作卡住、pool 被換掉而連帶失敗的，換到新的 pool 再跑一次
+                    if attempt == 0 and pool is not self._pool:
+                        continue
+                    self.failures += 1
+                    self._restart("broken pool", pool)
+                    raise RuntimeError("解析 worker 異常結束，請再試一次")
+
+    async def extract(self, url: str) -> dict:
+        return await self._run(yt_worker.extract, url)
+
+    async def extract_playlist(self, url: str, limit: int) -> dict:
+        return await self._run(yt_worker.extract_playlist, url, limit)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def format_stats(self) -> str:
+        return (
+            f"workers={self.workers} jobs={self.jobs} timeouts={self.timeouts} "
+            f"failures={self.failures} restarts={self.restarts}"
+        )
 
-    return opts
 
+yt_extractor = ExtractionService(
+    YT_WORKERS, YT_WORKER_MAX_JOBS, YT_EXTRACT_TIMEOUT_SECONDS, YT_EXTRACT_CONCURRENCY
+)
 
-async def get_stream_info(url: str):
-    loop = asyncio.get_running_loop()
-    ydl_opts = build_ytdlp_options()
 
+async def extract_stream_info(url: str):
     print(f"[yt] start extract: {url}", flush=True)
-
-    def _extract():
-        opts = {
-            "format": "bestaudio/best",
-            "noplaylist": True,
-            "quiet": True,
-            "nocheckcertificate": True,
-            "cachedir": False,
-            "force_ipv4": True,
-            "socket_timeout": 15,
-            "retries": 1,
-            "extractor_args": {
-                "youtube": {
-                    "player_client": ["ios", "default"],
-                }
-            },
-            "http_headers": {
-                "User-Agent": (
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/124.0.0.0 Safari/537.36"
-                )
-            },
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            if "entries" in info:
-                info = info["entries"][0]
-            return {
-                "title": info.get("title", "未知音樂"),
-                "stream_url": info["url"],
-            }
-
-    result = await loop.run_in_executor(None, _extract)
+    result = await yt_extractor.extract(url)
     print(f"[yt] extract done: {result['title']}", flush=True)
     return result
 
 
+# =========================
+# yt-dlp 解析快取：以影片 ID 為 key，依串流網址的 expire 參數失效
+# =========================
+
+YT_CACHE_MAX_ENTRIES = int(os.getenv("YT_CACHE_MAX_ENTRIES", "128"))
+# 串流網址沒有 expire 參數時的存活時間
+YT_CACHE_TTL_SECONDS = float(os.getenv("YT_CACHE_TTL_SECONDS", "3600"))
+# 離 expire 不到這麼多秒就當作過期，避免播到一半網址失效
+YT_CACHE_EXPIRY_MARGIN_SECONDS = float(os.getenv("YT_CACHE_EXPIRY_MARGIN_SECONDS", "600"))
+
+YOUTUBE_HOSTS = {"youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com"}
+YOUTUBE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+
+def youtube_video_id(url: str) -> str | None:
+    parts = urllib.parse.urlsplit(url.strip())
+    host = parts.netloc.lower()
+    path = parts.path.strip("/").split("/")
+
+    candidate = None
+    if host in ("youtu.be", "www.youtu.be"):
+        candidate = path[0]
+    elif host in YOUTUBE_HOSTS:
+        if path[0] == "watch":
+            candidate = urllib.parse.parse_qs(parts.query).get("v", [None])[0]
+        elif path[0] in ("shorts", "embed", "live", "v") and len(path) > 1:
+            candidate = path[1]
+
+    if candidate and YOUTUBE_ID_RE.match(candidate):
+        return candidate
+    return None
+
+
+# 一次最多加入這麼多首；每首的串流只在快輪到時（預先解析範圍內）才解析
+YT_PLAYLIST_MAX_ITEMS = int(os.getenv("YT_PLAYLIST_MAX_ITEMS", "500"))
+
+
+def is_playlist_url(url: str) -> bool:
+    # watch?v=...&list=... 是「從清單點進來的單曲」，照舊只播那一首
+    parts = urllib.parse.urlsplit(url.strip())
+    return (
+        parts.netloc.lower() in YOUTUBE_HOSTS
+        and parts.path.rstrip("/") == "/playlist"
+        and "list" in urllib.parse.parse_qs(parts.query)
+    )
+
+
+def stream_url_expires_at(stream_url: str) -> float:
+    # googlevideo 網址的 expire 是 unix 秒數（可能在 query，也可能在 path 片段 /expire/<ts>/）
+    parts = urllib.parse.urlsplit(stream_url)
+    expire = urllib.parse.parse_qs(parts.query).get("expire", [None])[0]
+    if expire is None:
+        segments = parts.path.split("/")
+        if "expire" in segments:
+            idx = segments.index("expire")
+            expire = segments[idx + 1] if idx + 1 < len(segments) else None
+
+    try:
+        return float(expire) - YT_CACHE_EXPIRY_MARGIN_SECONDS
+    except (TypeError, ValueError):
+        return time.time() + YT_CACHE_TTL_SECONDS
+
+
+class StreamInfoCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # key -> (解析結果, 失效時間 unix 秒)，順序 = 最近使用
+        self.entries: dict[str, tuple[dict, float]] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+        # 解析中的 task -> 還在等結果的呼叫數；全部取消時解析本身也停掉
+        self._waiters: dict[asyncio.Task, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidated = 0
+
+    @staticmethod
+    def cache_key(url: str) -> str:
+        video_id = youtube_video_id(url)
+        return f"yt:{video_id}" if video_id else url.strip()
+
+    def invalidate(self, url: str):
+        # 串流網址在 expire 之前就失效（403、換 IP）時，丟掉讓下次重新解析
+        if self.entries.pop(self.cache_key(url), None) is not None:
+            self.invalidated += 1
+
+    def _store(self, key: str, info: dict):
+        self.entries.pop(key, None)
+        self.entries[key] = (info, stream_url_expires_at(info["stream_url"]))
+        while len(self.entries) > self.max_entries:
+            del self.entries[next(iter(self.entries))]
+
+    async def _extract(self, key: str, url: str) -> dict:
+        try:
+            info = await extract_stream_info(url)
+            self._store(key, info)
+            return info
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    async def get(self, url: str) -> dict:
+        key = self.cache_key(url)
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[1] > time.time():
+                self.hits += 1
+                # 移到最後 = 最近使用
+                self.entries[key] = self.entries.pop(key)
+                return entry[0]
+            self.expired += 1
+            del self.entries[key]
+        else:
+            self.misses += 1
+
+        # 同一首歌同時被要求時只解析一次
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._extract(key, url))
+            self._inflight[key] = task
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                # 等這首的人都取消了（例如清掉佇列時的預先解析）：解析也取消，不佔著解析名額
+                if not task.done():
+                    task.cancel()
+                    if self._inflight.get(key) is task:
+                        del self._inflight[key]
+
+    def format_stats(self) -> str:
+        return (
+            f"entries={len(self.entries)}/{self.max_entries} hits={self.hits} "
+            f"misses={self.misses} expired={self.expired} invalidated={self.invalidated}"
+        )
+
+
+stream_info_cache = StreamInfoCache(YT_CACHE_MAX_ENTRIES)
+
+
+async def get_stream_info(url: str):
+    return await stream_info_cache.get(url)
+
+
 # =========================
 # Sleep Check UI（按鈕 + Modal）
 # =========================
@@ -645,7 +2430,8 @@ class NotSleepModal(discord.ui.Modal, title="還沒睡（告訴我為什麼！
         reason_text = str(self.reason.value).strip()
         await interaction.response.send_message("已記錄 ✅", ephemeral=True)
 
-        await self.channel.send(
+        await outbound.send(
+            self.channel,
             f"❌ {interaction.user.mention} 還沒睡\n原因：{reason_text}",
             allowed_mentions=_allowed_mentions_all(),
         )
@@ -668,7 +2454,8 @@ class SleepCheckView(discord.ui.View):
         sleep_responded_users.add(user_id)
         await interaction.response.send_message("已記錄 ✅", ephemeral=True)
 
-        await self.channel.send(
+        await outbound.send(
+            self.channel,
             f"✅ {interaction.user.mention} 我睡了",
             allowed_mentions=_allowed_mentions_all(),
         )
@@ -710,10 +2497,11 @@ async def run_sleep_check_now(channel: discord.TextChannel):
         targets.append(m)
 
     if not targets:
-        await channel.send("🎉 檢查結果：大家都回報了！晚安～", allowed_mentions=_allowed_mentions_all())
+        await outbound.send(channel, "🎉 檢查結果：大家都回報了！晚安～", allowed_mentions=_allowed_mentions_all())
         return
 
-    await channel.send(
+    await outbound.send(
+        channel,
         "@everyone ⏰ 測試檢查：還沒回報的人請按上方按鈕回報～",
         allowed_mentions=_allowed_mentions_all(),
     )
@@ -724,7 +2512,8 @@ async def run_sleep_check_now(channel: discord.TextChannel):
         mention = m.mention
         add_len = len(mention) + 1
         if current_len + add_len > 1800:
-            await channel.send(
+            await outbound.send(
+                channel,
                 "還沒回報的人： " + " ".join(chunk),
                 allowed_mentions=_allowed_mentions_all(),
             )
@@ -734,7 +2523,8 @@ async def run_sleep_check_now(channel: discord.TextChannel):
         current_len += add_len
 
     if chunk:
-        await channel.send(
+        await outbound.send(
+            channel,
             "還沒回報的人： " + " ".join(chunk),
             allowed_mentions=_allowed_mentions_all(),
         )
@@ -791,7 +2581,8 @@ async def sleep_check_task():
                 f"請在下方回報：你有沒有乖乖睡覺？"
             )
 
-            msg = await channel.send(
+            msg = await outbound.send(
+                channel,
                 content,
                 view=SleepCheckView(channel),
                 allowed_mentions=_allowed_mentions_all()
@@ -826,9 +2617,10 @@ async def sleep_check_task():
             targets.append(m)
 
         if not targets:
-            await channel.send("🎉 02:30 檢查：大家都回報了！晚安～", allowed_mentions=_allowed_mentions_all())
+            await outbound.send(channel, "🎉 02:30 檢查：大家都回報了！晚安～", allowed_mentions=_allowed_mentions_all())
         else:
-            await channel.send(
+            await outbound.send(
+                channel,
                 "@everyone ⏰ 02:30 了！還沒回報的人請趕快按上方按鈕回報～",
                 allowed_mentions=_allowed_mentions_all(),
             )
@@ -839,7 +2631,8 @@ async def sleep_check_task():
                 mention = m.mention
                 add_len = len(mention) + 1
                 if current_len + add_len > 1800:
-                    await channel.send(
+                    await outbound.send(
+                        channel,
                         "還沒回報的人： " + " ".join(chunk),
                         allowed_mentions=_allowed_mentions_all(),
                     )
@@ -849,83 +2642,443 @@ async def sleep_check_task():
                 current_len += add_len
 
             if chunk:
-                await channel.send(
+                await outbound.send(
+                    channel,
                     "還沒回報的人： " + " ".join(chunk),
                     allowed_mentions=_allowed_mentions_all(),
                 )
 
 
 # =========================
-# 播放下一首（核心）
+# 本機音訊快取：常播的歌以影片 ID 存成檔案，總大小有上限、LRU 淘汰，索引落地保存
 # =========================
 
-async def play_next(ctx):
-    global is_playing
+# 第一次播放時，播放用的 FFmpeg 會把送給 Discord 的 Opus 順便寫一份到快取，不另外下載
+AUDIO_CACHE_ENABLED = os.getenv("AUDIO_CACHE_ENABLED", "0") == "1"
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", "audio_cache")
+AUDIO_CACHE_MAX_MB = float(os.getenv("AUDIO_CACHE_MAX_MB", "512"))
+# 超過這個大小的（通常是很長的影片）就不存
+AUDIO_CACHE_MAX_TRACK_MB = float(os.getenv("AUDIO_CACHE_MAX_TRACK_MB", "32"))
+# 快取自己寫的檔名：<影片 ID>.mka，寫入中多一個 .part；啟動清理只動這些，目錄被共用也不會誤刪別人的檔案
+AUDIO_CACHE_FILE_RE = re.compile(r"^[A-Za-z0-9_-]{11}\.[A-Za-z0-9]+(\.part)?$")
+
+
+class AudioDiskCache:
+    def __init__(self, directory: str, max_bytes: int, max_track_bytes: int):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self.max_bytes = max_bytes
+        self.max_track_bytes = max_track_bytes
+        # video_id -> {"file", "size", "acodec", "title"}，順序 = 最近使用
+        self.entries: dict[str, dict] = {}
+        self.total_bytes = 0
+        # video_id -> 播放中正在寫的 .part 路徑
+        self._writing: dict[str, str] = {}
+        self._save_lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.skipped = 0
+
+    def _path(self, entry: dict) -> str:
+        return os.path.join(self.directory, entry["file"])
+
+    def load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            saved = []
+        except Exception as e:
+            print(f"[audio-cache] 讀取索引失敗：{e}", flush=True)
+            saved = []
+
+        for video_id, entry in saved:
+            path = self._path(entry)
+            if os.path.exists(path):
+                entry["size"] = os.path.getsize(path)
+                self.entries[video_id] = entry
+                self.total_bytes += entry["size"]
+
+        # 索引裡沒有的快取檔（下載到一半的 .part、舊索引遺留、寫到一半的索引）直接清掉
+        known = {entry["file"] for entry in self.entries.values()}
+        for name in os.listdir(self.directory):
+            is_ours = AUDIO_CACHE_FILE_RE.match(name) or name == "index.json.tmp"
+            if is_ours and name not in known:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+        self._evict()
+        print(
+            f"[audio-cache] 已載入 {len(self.entries)} 首（{self.total_bytes / 1048576:.1f} MB）",
+            flush=True
+        )
 
-    if len(music_queue) == 0:
-        is_playing = False
-        return
+    def has(self, video_id: str | None) -> bool:
+        return video_id is not None and video_id in self.entries
+
+    def lookup(self, video_id: str | None) -> dict | None:
+        if video_id is None:
+            return None
+
+        entry = self.entries.pop(video_id, None)
+        if entry is None or not os.path.exists(self._path(entry)):
+            if entry is not None:
+                self.total_bytes -= entry["size"]
+                asyncio.create_task(self.save())
+            self.misses += 1
+            return None
+
+        # 移到最後 = 最近使用
+        self.entries[video_id] = entry
+        self.hits += 1
+        asyncio.create_task(self.save())
+        return {**entry, "path": self._path(entry)}
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            video_id = next(iter(self.entries))
+            entry = self.entries.pop(video_id)
+            self.total_bytes -= entry["size"]
+            self.evictions += 1
+            try:
+                os.remove(self._path(entry))
+            except OSError:
+                pass
+
+    def begin_store(self, info: dict) -> str | None:
+        # 回傳這首要寫入的 .part 路徑，交給播放的 FFmpeg 順便寫；不用存就回傳 None
+        video_id = info.get("video_id")
+        if AUDIO_PLAYBACK_MODE == "pcm" or not video_id:
+            return None
+        if video_id in self.entries or video_id in self._writing:
+            return None
+
+        # 直播沒有長度；太長的影片估出來超過上限就不存
+        duration = info.get("duration")
+        if not duration or duration * (info.get("abr") or 128) * 125 > self.max_track_bytes:
+            self.skipped += 1
+            return None
+
+        part_path = os.path.join(self.directory, f"{video_id}.mka.part")
+        self._writing[video_id] = part_path
+        return part_path
+
+    async def finish_store(self, info: dict, complete: bool):
+        # 播放結束後呼叫：整首播完才改名收進快取；被跳過、播放失敗或中途斷掉就丟掉
+        video_id = info["video_id"]
+        part_path = self._writing.pop(video_id, None)
+        if part_path is None:
+            return
 
-    is_playing = True
-    item = music_queue.pop(0)
-    voice_client = ctx.voice_client
+        filename = f"{video_id}.mka"
+        loop = asyncio.get_running_loop()
+        size = 0
+        try:
+            if complete:
+                size = await loop.run_in_executor(None, os.path.getsize, part_path)
+                if size > self.max_track_bytes:
+                    self.skipped += 1
+                    complete = False
+                else:
+                    # 寫完才改名，不會留下半個檔案被當成快取
+                    await loop.run_in_executor(None, os.replace, part_path, os.path.join(self.directory, filename))
+        except OSError as e:
+            print(f"[audio-cache] 存入 {video_id} 失敗：{e}", flush=True)
+            complete = False
+
+        if not complete:
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+            return
 
-    if voice_client is None:
-        is_playing = False
-        return
+        self.entries[video_id] = {
+            "file": filename,
+            "size": size,
+            # 存的是送給 Discord 的那一份，一定是 Opus
+            "acodec": "opus",
+            "title": info.get("title", "未知音樂"),
+        }
+        self.total_bytes += size
+        self.stores += 1
+        self._evict()
+        await self.save()
+
+    def _write(self, payload: str):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, self.index_path)
+
+    async def save(self):
+        async with self._save_lock:
+            payload = json.dumps(list(self.entries.items()), ensure_ascii=False)
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write, payload)
+            except Exception as e:
+                print(f"[audio-cache] 寫入索引失敗：{e}", flush=True)
+
+    def format_stats(self) -> str:
+        return (
+            f"tracks={len(self.entries)} size={self.total_bytes / 1048576:.1f}/{self.max_bytes / 1048576:.0f}MB "
+            f"hits={self.hits} misses={self.misses} stores={self.stores} "
+            f"evictions={self.evictions} skipped={self.skipped} writing={len(self._writing)}"
+        )
 
-    try:
-        if item["type"] == "yt":
-            info = await get_stream_info(item["url"])
-            title = info["title"]
-            stream_url = info["stream_url"]
-            source = discord.FFmpegPCMAudio(stream_url, **FFMPEG_OPTIONS)
 
-        elif item["type"] == "file":
-            title = item.get("title", "本地音檔")
-            source = discord.FFmpegPCMAudio(item["path"])
+audio_cache = (
+    AudioDiskCache(
+        AUDIO_CACHE_DIR,
+        int(AUDIO_CACHE_MAX_MB * 1048576),
+        int(AUDIO_CACHE_MAX_TRACK_MB * 1048576),
+    )
+    if AUDIO_CACHE_ENABLED else None
+)
 
-        else:
-            raise RuntimeError("未知的 queue 類型")
 
+# =========================
+# 音樂播放器：每個伺服器一個，各自有播放清單、狀態與預先解析
+# =========================
 
+# 目前這首開始播放時，先把後面幾首的串流抓好
+YT_PREFETCH_AHEAD = int(os.getenv("YT_PREFETCH_AHEAD", "2"))
+# YouTube 串流在這麼短時間內就結束（影片本身更長），當作串流網址失效
+YT_EARLY_END_SECONDS = float(os.getenv("YT_EARLY_END_SECONDS", "5"))
+# 沒在播放超過這麼久就釋放播放器（不會離開語音頻道）
+MUSIC_IDLE_TIMEOUT_SECONDS = float(os.getenv("MUSIC_IDLE_TIMEOUT_SECONDS", "600"))
 
-    except Exception as e:
 
-        msg = str(e)
+def _log_prefetch_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"[yt] prefetch failed: {task.exception()}", flush=True)
 
-        print(f"[yt] extract/play failed: {msg}", flush=True)
 
-        if "Sign in to confirm you’re not a bot" in msg or "Sign in to confirm you're not a bot" in msg:
+def cancel_prefetch(items):
+    for item in items:
+        task = item.pop("prefetch", None)
+        if task is not None and not task.done():
+            task.cancel()
 
-            await ctx.send("❌ YouTube 目前擋下播放請求，可能是 cookies 過期或雲端 IP 被判定異常。")
 
-        else:
+async def resolve_queue_item(item: dict) -> dict:
+    task = item.pop("prefetch", None)
+    if task is not None:
+        try:
+            await task
+        except Exception:
+            pass
+    # 預先解析的結果已在快取裡；等太久過期的話這裡會自動重新解析
+    return await get_stream_info(item["url"])
+
+
+class GuildPlayer:
+    def __init__(self, guild: discord.Guild):
+        self.guild = guild
+        self.queue: deque[dict] = deque()
+        self.is_playing = False
+        # !skip / !stop 主動停掉的曲目不算播放失敗，不重試
+        self._stop_requested = False
+        # 播放通知送到最後一次下指令的文字頻道
+        self.channel: discord.abc.Messageable | None = None
+        self.last_active = time.monotonic()
+
+    @property
+    def voice_client(self) -> discord.VoiceClient | None:
+        return self.guild.voice_client
+
+    def touch(self, channel: discord.abc.Messageable | None = None):
+        self.last_active = time.monotonic()
+        if channel is not None:
+            self.channel = channel
+
+    async def notify(self, content: str):
+        # 各伺服器的播放通知也走發送排程，跟其他訊息一起限速
+        if self.channel is not None:
+            await outbound.send(self.channel, content, priority=PRIORITY_NORMAL)
+
+    def is_idle(self, now: float) -> bool:
+        voice_client = self.voice_client
+        busy = self.is_playing or (voice_client is not None and voice_client.is_playing())
+        return not busy and now - self.last_active >= MUSIC_IDLE_TIMEOUT_SECONDS
+
+    def enqueue(self, *items: dict):
+        self.queue.extend(items)
+        if self.is_playing:
+            self.schedule_prefetch()
+
+    def schedule_prefetch(self):
+        for item in itertools.islice(self.queue, YT_PREFETCH_AHEAD):
+            if item["type"] != "yt" or "prefetch" in item:
+                continue
+            if audio_cache is not None and audio_cache.has(youtube_video_id(item["url"])):
+                continue
+            item["prefetch"] = asyncio.create_task(get_stream_info(item["url"]))
+            item["prefetch"].add_done_callback(_log_prefetch_failure)
+
+    def clear(self):
+        cancel_prefetch(self.queue)
+        self.queue.clear()
+        self.is_playing = False
+        self._stop_requested = True
+
+    def skip(self):
+        self._stop_requested = True
+        if self.voice_client is not None:
+            self.voice_client.stop()
+
+    def _retry_stream(self, item: dict, reason: str) -> bool:
+        # 串流網址失效：丟掉快取的解析結果，這首重新解析再播一次（只重試一次）
+        if item["type"] != "yt" or item.get("retried"):
+            return False
+        item["retried"] = True
+        stream_info_cache.invalidate(item["url"])
+        self.queue.appendleft(item)
+        print(f"[yt] 串流失效（{reason}），重新解析：{item['url']}", flush=True)
+        return True
 
-            # 這裡加上 [:1500] 來限制字數，避免超過 Discord 的 2000 字限制！
+    async def _track_finished(self, item: dict, error: Exception | None, started_at: float, duration: float | None):
+        stopped, self._stop_requested = self._stop_requested, False
+        elapsed = time.monotonic() - started_at
+        if error is not None:
+            print(f"播放發生錯誤：{error}", flush=True)
 
-            await ctx.send(f"❌ 取得音訊失敗：\n```\n{msg[:1500]}\n```")
+        cache_info = item.pop("cache_info", None)
+        if cache_info is not None:
+            # 整首正常播完，播放時順便寫的快取檔才是完整的
+            complete = not stopped and error is None and elapsed + YT_EARLY_END_SECONDS >= (duration or 0)
+            await audio_cache.finish_store(cache_info, complete)
 
-    asyncio.create_task(play_next(ctx))
+        if not stopped and item.get("stream_url") is not None:
+            ended_early = elapsed < YT_EARLY_END_SECONDS and (duration or 0) > YT_EARLY_END_SECONDS
+            if error is not None or ended_early:
+                self._retry_stream(item, "播放錯誤" if error is not None else f"{elapsed:.1f} 秒就結束")
 
-    return
+        await self.play_next()
 
-    def after_playing(error):
-        if error:
-            print(f"播放發生錯誤：{error}", flush=True)
+    async def play_next(self):
+        self.touch()
 
-        if item["type"] == "file":
-            try:
-                p = item["path"]
-                if os.path.exists(p):
-                    os.remove(p)
-            except Exception as ex:
-                print(f"刪除暫存檔失敗：{ex}", flush=True)
+        if not self.queue:
+            self.is_playing = False
+            return
+
+        self.is_playing = True
+        item = self.queue.popleft()
+        voice_client = self.voice_client
+
+        if voice_client is None:
+            self.is_playing = False
+            return
+
+        fresh_info = None
+        stream_url = None
+        cache_path = None
+        try:
+            cached = None
+            if item["type"] == "yt" and audio_cache is not None:
+                cached = audio_cache.lookup(youtube_video_id(item["url"]))
+
+            if cached is not None:
+                cancel_prefetch([item])
+                title = cached["title"]
+                source = await build_audio_source(cached["path"], cached.get("acodec"))
+
+            elif item["type"] == "yt":
+                info = await resolve_queue_item(item)
+                title = info["title"]
+                stream_url = info["stream_url"]
+                fresh_info = info
+                if audio_cache is not None:
+                    cache_path = audio_cache.begin_store(info)
+                source = await build_audio_source(
+                    stream_url, info.get("acodec"), cache_path=cache_path, **FFMPEG_OPTIONS
+                )
+
+            elif item["type"] == "attachment":
+                # 直接從 Discord CDN 串流，不先下載到本機
+                title = item.get("title", "上傳的音檔")
+                source = await build_audio_source(item["url"], **FFMPEG_OPTIONS)
+
+            else:
+                raise RuntimeError("未知的 queue 類型")
+
+        except Exception as e:
+            msg = str(e)
+            print(f"[yt] extract/play failed: {msg}", flush=True)
+            if cache_path is not None:
+                await audio_cache.finish_store(fresh_info, False)
+
+            # 解析成功、但開串流失敗：多半是快取的網址已失效，重新解析一次
+            if stream_url is not None and self._retry_stream(item, msg[:100]):
+                asyncio.create_task(self.play_next())
+                return
+
+            if "Sign in to confirm you’re not a bot" in msg or "Sign in to confirm you're not a bot" in msg:
+                await self.notify("❌ YouTube 目前擋下播放請求，可能是 cookies 過期或雲端 IP 被判定異常。")
+            else:
+                # 這裡加上 [:1500] 來限制字數，避免超過 Discord 的 2000 字限制！
+                await self.notify(f"❌ 取得音訊失敗：\n```\n{msg[:1500]}\n```")
+
+            asyncio.create_task(self.play_next())
+            return
+
+        # 只有直接從 YouTube 串流的曲目才需要判斷網址是否失效
+        item["stream_url"] = fresh_info["stream_url"] if fresh_info is not None else None
+        item["cache_info"] = fresh_info if cache_path is not None else None
+        duration = fresh_info.get("duration") if fresh_info is not None else None
+        started_at = time.monotonic()
+        self._stop_requested = False
 
-        asyncio.run_coroutine_threadsafe(play_next(ctx), bot.loop)
+        def after_playing(error):
+            asyncio.run_coroutine_threadsafe(self._track_finished(item, error, started_at, duration), bot.loop)
 
-    voice_client.play(source, after=after_playing)
-    await ctx.send(f"▶ 正在播放：**{title}**")
+        voice_client.play(source, after=after_playing)
+        self.schedule_prefetch()
+        await self.notify(f"▶ 正在播放：**{title}**")
+
+
+music_players: dict[int, GuildPlayer] = {}
+
+
+def get_player(guild: discord.Guild) -> GuildPlayer:
+    player = music_players.get(guild.id)
+    if player is None:
+        player = GuildPlayer(guild)
+        music_players[guild.id] = player
+    return player
+
+
+def evict_idle_players(now: float) -> list[int]:
+    # 只釋放播放器物件；語音連線照舊留著（!join 之後本來就會一直陪在頻道裡）
+    evicted = []
+    for guild_id, player in list(music_players.items()):
+        if not player.is_idle(now):
+            continue
+        player.clear()
+        del music_players[guild_id]
+        evicted.append(guild_id)
+        print(f"[music] 釋放閒置播放器：{guild_id}", flush=True)
+    return evicted
+
+
+async def music_idle_task():
+    await bot.wait_until_ready()
+
+    while not bot.is_closed():
+        await asyncio.sleep(60)
+        evict_idle_players(time.monotonic())
+
+
+def format_music_stats() -> str:
+    playing = sum(1 for p in music_players.values() if p.is_playing)
+    queued = sum(len(p.queue) for p in music_players.values())
+    return f"players={len(music_players)} playing={playing} queued={queued}"
 
 
 # =========================
@@ -971,7 +3124,7 @@ async def countdown_task():
             diff = (EXAM_START - today).days
             msg = f"📘 期末考倒數：還剩 **{diff} 天**！（考試第一天：6/21）"
 
-        await channel.send(msg)
+        await outbound.send(channel, msg)
 
 
 async def daily_crypto_summary_task():
@@ -1000,8 +3153,14 @@ async def daily_crypto_summary_task():
         if now >= target:
             target = target + datetime.timedelta(days=1)
 
-        wait_seconds = (target - now).total_seconds()
-        await asyncio.sleep(wait_seconds)
+        prewarm_at = target - datetime.timedelta(seconds=DAILY_SUMMARY_PREWARM_SECONDS)
+        await asyncio.sleep(max(0.0, (prewarm_at - now).total_seconds()))
+        try:
+            await daily_summary.prewarm()
+        except Exception as e:
+            print(f"[daily-summary] 預熱失敗：{e}", flush=True)
+
+        await asyncio.sleep(max(0.0, (target - datetime.datetime.now(TZ)).total_seconds()))
 
         now2 = datetime.datetime.now(TZ)
         today = now2.date()
@@ -1010,12 +3169,13 @@ async def daily_crypto_summary_task():
             continue
 
         try:
-            msg = await build_daily_summary_message(now2)
+            msg, news_items = await daily_summary.build(now2)
         except Exception as e:
             print(f"[daily-summary] 建立摘要失敗：{e}", flush=True)
             continue
 
-        await channel.send(msg)
+        if await outbound.send(channel, msg) is not None:
+            await record_posted_news(news_items)
         last_daily_summary_date = today
 
 
@@ -1027,7 +3187,11 @@ async def on_ready():
         asyncio.create_task(countdown_task())
         asyncio.create_task(sleep_check_task())
         asyncio.create_task(daily_crypto_summary_task())
+        asyncio.create_task(news_poll_task())
+        asyncio.create_task(music_idle_task())
         crypto_price_watch_task.start()
+        if CRYPTO_STREAM_ENABLED:
+            asyncio.create_task(price_stream.run())
         task_started = True
 
 
@@ -1057,7 +3221,8 @@ async def early_sleep(ctx: commands.Context):
     if channel is None:
         channel = await bot.fetch_channel(SLEEP_CHANNEL_ID)
 
-    await channel.send(
+    await outbound.send(
+        channel,
         f"✅ {ctx.author.mention} 我睡了（提前回報：{now.hour:02d}:{now.minute:02d}）",
         allowed_mentions=_allowed_mentions_all(),
     )
@@ -1090,7 +3255,8 @@ async def early_no_sleep(ctx: commands.Context, *, reason: str = ""):
     if channel is None:
         channel = await bot.fetch_channel(SLEEP_CHANNEL_ID)
 
-    await channel.send(
+    await outbound.send(
+        channel,
         f"❌ {ctx.author.mention} 還沒睡（提前回報：{now.hour:02d}:{now.minute:02d}）\n原因：{reason[:200]}",
         allowed_mentions=_allowed_mentions_all(),
     )
@@ -1121,19 +3287,35 @@ async def exam_countdown(ctx: commands.Context):
     await ctx.send(msg)
 
 @bot.command(name="price")
-async def price_now(ctx: commands.Context):
+async def price_now(ctx: commands.Context, coin: str = ""):
+    symbols = CRYPTO_SYMBOLS
+    if coin:
+        symbol = normalize_coin_symbol(coin)
+        if symbol is None:
+            await ctx.send(f"❌ 只支援 {supported_symbols_text()}\n用法：`!price` 或 `!price btc`")
+            return
+        symbols = [symbol]
+
     try:
-        prices = await fetch_crypto_prices()
+        prices, age = await price_cache.get()
     except Exception as e:
         await ctx.send(f"❌ 抓價格失敗：{e}")
         return
 
-    msg = (
-        f"BTC：{fmt_price('BTC', prices['BTC'])}\n"
-        f"ETH：{fmt_price('ETH', prices['ETH'])}\n"
-        f"BNB：{fmt_price('BNB', prices['BNB'])}"
-    )
-    await ctx.send(msg)
+    chunk = []
+    current_len = 0
+    for symbol in symbols:
+        price = prices.get(symbol)
+        line = f"{symbol}：{fmt_price(symbol, price)}" if price is not None else f"{symbol}：暫時抓不到報價"
+        if current_len + len(line) + 1 > 1800:
+            await ctx.send("\n".join(chunk))
+            chunk = []
+            current_len = 0
+        chunk.append(line)
+        current_len += len(line) + 1
+
+    chunk.append(f"（資料時間：{format_data_age(age)}）")
+    await ctx.send("\n".join(chunk))
 
 
 # =========================
@@ -1145,6 +3327,9 @@ is_giveaway_active = False
 giveaway_participants = []
 giveaway_user_ids = set()
 
+# 抽獎登記回覆排隊超過這麼久就不送了（反正 10 秒後也會被刪掉）
+GIVEAWAY_REPLY_MAX_AGE_SECONDS = 10
+
 
 # 1. 開始抽獎指令
 @bot.command(name="gstart")
@@ -1190,7 +3375,15 @@ async def giveaway_listener(message: discord.Message):
             await message.add_reaction("⭕")
 
             # 傳送短暫的提示訊息告知他是第幾位，3秒後自動刪除，保持版面乾淨
-            reply_msg = await message.reply(f"✅ 登記成功！你是第 **{len(giveaway_participants)}** 位參加者。")
+            reply_msg = await outbound.send(
+                message.channel,
+                f"✅ 登記成功！你是第 **{len(giveaway_participants)}** 位參加者。",
+                priority=PRIORITY_LOW,
+                max_age=GIVEAWAY_REPLY_MAX_AGE_SECONDS,
+                reference=message,
+            )
+            if reply_msg is None:
+                return
             await asyncio.sleep(10)
             await reply_msg.delete()
         except Exception as e:
@@ -1233,27 +3426,23 @@ async def draw_winner(ctx: commands.Context):
 async def set_alert(ctx: commands.Context, coin: str, price: float):
     symbol = normalize_coin_symbol(coin)
     if symbol is None:
-        await ctx.send("❌ 只支援 BTC / ETH / BNB\n用法：`!setalert btc 70000`")
+        await ctx.send(f"❌ 只支援 {supported_symbols_text()}\n用法：`!setalert btc 70000`")
         return
 
     if price <= 0:
         await ctx.send("❌ 價格必須大於 0")
         return
 
-    alerts = custom_price_alerts[symbol]
-
-    for alert in alerts:
-        if abs(alert["price"] - price) < 1e-9 and not alert["triggered"]:
-            await ctx.send(f"⚠️ {symbol} {price:,.2f} 的提醒已經存在了。")
-            return
-
-    alerts.append({
+    alert = {
         "price": float(price),
-        "triggered": False,
         "created_by": ctx.author.id,
-    })
+    }
+    if not custom_price_alerts[symbol].add(alert):
+        await ctx.send(f"⚠️ {symbol} {price:,.2f} 的提醒已經存在了。")
+        return
 
-    alerts.sort(key=lambda x: x["price"])
+    if state_store is not None:
+        state_store.alert_added(symbol, alert)
 
     await ctx.send(f"✅ 已設定 {symbol} 價格提醒：{price:,.2f}")
 
@@ -1263,14 +3452,12 @@ async def list_alerts(ctx: commands.Context):
     lines = ["📌 目前已設定的價格提醒："]
     has_any = False
 
-    for symbol in ["BTC", "ETH", "BNB"]:
-        alerts = custom_price_alerts[symbol]
-        active_alerts = [a for a in alerts if not a["triggered"]]
+    for symbol, alerts in custom_price_alerts.items():
 
-        if active_alerts:
+        if len(alerts):
             has_any = True
             lines.append(f"\n{symbol}：")
-            for idx, alert in enumerate(active_alerts, start=1):
+            for idx, alert in enumerate(alerts, start=1):
                 lines.append(f"  {idx}. {alert['price']:,.2f}")
 
     if not has_any:
@@ -1284,16 +3471,15 @@ async def list_alerts(ctx: commands.Context):
 async def delete_alert(ctx: commands.Context, coin: str, price: float):
     symbol = normalize_coin_symbol(coin)
     if symbol is None:
-        await ctx.send("❌ 只支援 BTC / ETH / BNB\n用法：`!delalert btc 70000`")
+        await ctx.send(f"❌ 只支援 {supported_symbols_text()}\n用法：`!delalert btc 70000`")
         return
 
-    alerts = custom_price_alerts[symbol]
-
-    for i, alert in enumerate(alerts):
-        if abs(alert["price"] - price) < 1e-9 and not alert["triggered"]:
-            alerts.pop(i)
-            await ctx.send(f"🗑️ 已刪除 {symbol} 價格提醒：{price:,.2f}")
-            return
+    removed = custom_price_alerts[symbol].remove(price)
+    if removed is not None:
+        if state_store is not None:
+            state_store.alert_removed(symbol, removed["price"])
+        await ctx.send(f"🗑️ 已刪除 {symbol} 價格提醒：{price:,.2f}")
+        return
 
     await ctx.send(f"❌ 找不到 {symbol} {price:,.2f} 的未觸發提醒。")
 
@@ -1303,7 +3489,8 @@ async def delete_alert(ctx: commands.Context, coin: str, price: float):
 async def daily_test(ctx: commands.Context):
     now = datetime.datetime.now(TZ)
     try:
-        msg = await build_daily_summary_message(now)
+        # 直接用預熱好的快取，不等 API
+        msg, _ = await daily_summary.build(now, refresh=False)
     except Exception as e:
         await ctx.send(f"❌ 測試每日摘要失敗：{e}")
         return
@@ -1311,22 +3498,47 @@ async def daily_test(ctx: commands.Context):
     await ctx.send(msg)
 
 
+@bot.command(name="stats")
+@commands.has_permissions(administrator=True)
+async def show_stats(ctx: commands.Context):
+    lines = [
+        "📈 Bot 內部統計",
+        f"HTTP：{http_client.format_stats()}",
+        f"價格串流：{price_stream.format_stats()}",
+        f"提醒發送：{alert_dispatcher.format_stats()}",
+        f"發送佇列：{outbound.format_stats()}",
+        f"價格快取：{price_cache.format_stats()}",
+        f"24h 快取：{ticker_24h_cache.format_stats()}",
+        f"新聞快取：{feed_cache.format_stats()}",
+        f"已發新聞紀錄：{len(seen_news)} 筆",
+        f"每日摘要：{daily_summary.format_stats()}",
+        f"yt-dlp 快取：{stream_info_cache.format_stats()}",
+        f"yt-dlp 解析：{yt_extractor.format_stats()}",
+        f"播放路徑：{format_audio_path_stats()}",
+        f"音樂播放器：{format_music_stats()}",
+        f"音訊快取：{audio_cache.format_stats() if audio_cache is not None else '未啟用'}",
+        f"狀態儲存：{state_store.format_stats() if state_store is not None else '未啟用'}",
+    ]
+    await ctx.send("\n".join(lines))
+
+
 @bot.command(name="help")
 async def custom_help(ctx: commands.Context):
     msg = (
         "!後：\n"
         "  help  顯示所有可用功能指令\n"
         "  exam  顯示期末考倒數\n"
-        "  price  顯示 BTC / ETH / BNB 目前價格\n"
+        f"  price [幣種]  顯示 {supported_symbols_text(limit=3)} 目前價格\n"
         "  dailytest  測試每日幣圈摘要（管理員）\n"
+        "  stats  顯示連線池等內部統計（管理員）\n"
         "  setalert <幣種> <價格>  設定價格提醒\n"
         "  alerts  查看目前未觸發的價格提醒\n"
         "  delalert <幣種> <價格>  刪除價格提醒\n\n"
         "  join   加入語音頻道陪你\n"
         "  bye   離開語音頻道\n\n"
         "  clear （數字） 清除當前頻道最近 X 則訊息\n\n"
-        "  play  播放這則訊息附帶的 mp3 檔\n"
-        "  yt      後接網址播放音樂\n"
+        "  play  播放這則訊息附帶的音檔（mp3、wav、ogg、flac、m4a…）\n"
+        "  yt      後接網址播放音樂（也可以貼整個播放清單）\n"
         "  skip  跳到清單下一首\n"
         "  stop  停止所有音樂播放\n\n"
         "  sleep 提前回報要睡覺\n"
@@ -1334,10 +3546,7 @@ async def custom_help(ctx: commands.Context):
         "  sleeptest   立刻發出睡覺回報按鈕（測試）\n"
         "  sleepcheck  立刻做一次未回報檢查（測試）\n\n"
         "【自動提醒】\n\n"
-        "  BTC / ETH / BNB：15 分鐘內漲跌超過 1% 提醒\n"
-        "  BTC / ETH / BNB：1 小時內漲跌超過 2% 提醒\n"
-        "  BTC：每跨 1000 美元提醒\n"
-        "  ETH：每跨 100 美元提醒\n"
+        f"{describe_crypto_alert_rules()}\n"
         "  自訂價格提醒觸發時會 @everyone\n"
         "  每天 19:00 自動發送每日幣圈摘要與 2 則重點新聞\n\n"
         
@@ -1372,7 +3581,7 @@ async def sleep_test(ctx: commands.Context):
         f"🧪（測試）🌙 現在是 **{now.month}月{now.day}日的凌晨 2:00**，該睡覺囉！\n"
         f"請在下方回報：你有沒有乖乖睡覺？"
     )
-    msg = await channel.send(content, view=SleepCheckView(channel), allowed_mentions=_allowed_mentions_all())
+    msg = await outbound.send(channel, content, view=SleepCheckView(channel), allowed_mentions=_allowed_mentions_all())
     sleep_message_id = msg.id
 
     await ctx.send("✅ 已在睡覺頻道發出測試訊息（含按鈕）。")
@@ -1454,10 +3663,31 @@ async def clear_messages_error(ctx: commands.Context, error):
 
 
 # =========================
-# play：播放上傳 mp3（改成進 queue）
+# play：播放上傳的音檔（直接從 CDN 串流，進 queue）
 # =========================
 
+AUDIO_ATTACHMENT_EXTENSIONS = {"mp3", "wav", "ogg", "opus", "flac", "m4a", "aac", "webm"}
+
+
+def cleanup_legacy_temp_files():
+    # 舊版會把附件存成工作目錄裡的 temp_<id>.mp3，播放失敗時就留著沒刪
+    for name in os.listdir("."):
+        if name.startswith("temp_") and name.endswith(".mp3"):
+            try:
+                os.remove(name)
+            except OSError as e:
+                print(f"刪除暫存檔失敗：{e}", flush=True)
+
+
+def is_audio_attachment(attachment: discord.Attachment) -> bool:
+    if attachment.content_type and attachment.content_type.startswith("audio/"):
+        return True
+    ext = attachment.filename.rsplit(".", 1)[-1].lower() if "." in attachment.filename else ""
+    return ext in AUDIO_ATTACHMENT_EXTENSIONS
+
+
 @bot.command(name="play")
+@commands.guild_only()
 async def play_audio(ctx: commands.Context):
     voice_state = ctx.author.voice
     if voice_state is None or voice_state.channel is None:
@@ -1476,22 +3706,21 @@ async def play_audio(ctx: commands.Context):
             await ctx.send(f"我換到：{channel.name} 頻道囉～")
 
     if not ctx.message.attachments:
-        await ctx.send("請把 mp3 檔案當作**附件**一起傳給我，再使用 `!play` 喔～")
+        await ctx.send("請把音檔當作**附件**一起傳給我，再使用 `!play` 喔～")
         return
 
     attachment = ctx.message.attachments[0]
-    if not attachment.filename.lower().endswith(".mp3"):
-        await ctx.send("目前我只支援 `.mp3` 檔案喔 QQ")
+    if not is_audio_attachment(attachment):
+        await ctx.send(f"這個檔案不是我認得的音檔格式喔 QQ（支援：{'、'.join(sorted(AUDIO_ATTACHMENT_EXTENSIONS))}）")
         return
 
-    temp_filename = f"temp_{attachment.id}.mp3"
-    await attachment.save(temp_filename)
-
-    music_queue.append({"type": "file", "path": temp_filename, "title": attachment.filename})
+    player = get_player(ctx.guild)
+    player.touch(ctx.channel)
+    player.enqueue({"type": "attachment", "url": attachment.url, "title": attachment.filename})
     await ctx.send(f"🎵 已加入播放清單：**{attachment.filename}**")
 
-    if not is_playing:
-        await play_next(ctx)
+    if not player.is_playing:
+        await player.play_next()
 
 
 # =========================
@@ -1499,9 +3728,8 @@ async def play_audio(ctx: commands.Context):
 # =========================
 
 @bot.command(name="yt")
+@commands.guild_only()
 async def play_youtube(ctx: commands.Context, url: str):
-    global is_playing
-
     voice_state = ctx.author.voice
     if voice_state is None or voice_state.channel is None:
         await ctx.send("你要先進入語音頻道喔！")
@@ -1515,30 +3743,49 @@ async def play_youtube(ctx: commands.Context, url: str):
     elif voice_client.channel.id != channel.id:
         await voice_client.move_to(channel)
 
-    music_queue.append({"type": "yt", "url": url})
-    await ctx.send("🎵 已加入播放清單（播放時會抓最新串流）")
+    player = get_player(ctx.guild)
+    player.touch(ctx.channel)
+
+    if is_playlist_url(url):
+        try:
+            playlist = await yt_extractor.extract_playlist(url, YT_PLAYLIST_MAX_ITEMS)
+        except Exception as e:
+            await ctx.send(f"❌ 讀取播放清單失敗：\n```\n{str(e)[:1500]}\n```")
+            return
+
+        entries = playlist["entries"]
+        if not entries:
+            await ctx.send("這個播放清單裡沒有可以播放的影片喔！")
+            return
+
+        player.enqueue(*({"type": "yt", "url": e["url"], "title": e["title"]} for e in entries))
+        await ctx.send(f"🎵 已加入播放清單 **{playlist['title']}**：{len(entries)} 首")
+    else:
+        player.enqueue({"type": "yt", "url": url})
+        await ctx.send("🎵 已加入播放清單（播放時會抓最新串流）")
 
-    if not is_playing:
-        await play_next(ctx)
+    if not player.is_playing:
+        await player.play_next()
 
 
 @bot.command(name="stop")
+@commands.guild_only()
 async def stop_audio(ctx: commands.Context):
-    global music_queue, is_playing
-
     voice_client = ctx.voice_client
     if voice_client is None:
         await ctx.send("我目前不在語音頻道中喔！")
         return
 
-    music_queue.clear()
-    is_playing = False
+    player = get_player(ctx.guild)
+    player.touch(ctx.channel)
+    player.clear()
     voice_client.stop()
 
     await ctx.send("⏹ 已停止播放並清空播放清單！")
 
 
 @bot.command(name="skip")
+@commands.guild_only()
 async def skip_song(ctx: commands.Context):
     voice_client = ctx.voice_client
 
@@ -1546,8 +3793,12 @@ async def skip_song(ctx: commands.Context):
         await ctx.send("目前沒有音樂正在播放哦！")
         return
 
-    voice_client.stop()
+    player = get_player(ctx.guild)
+    player.touch(ctx.channel)
+    player.skip()
     await ctx.send("⏭ 已跳到下一首！")
 
 
-bot.run(TOKEN)
\ No newline at end of file
+# 正式環境請用 main.py 啟動：直接執行 bot.py 時，每個 yt-dlp 解析 worker（spawn）都會把這個檔案整個重新載入一次
+if __name__ == "__main__":
+    bot.run(TOKEN)
\ No newline at end of file
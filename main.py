@@ -0,0 +1,7 @@
+# 啟動入口（bot 本體在 bot.py）
+# yt-dlp 解析 worker 用 spawn 啟動，每個 worker 都會重新執行 __main__ 這個腳本；
+# 只有直接執行時才 import bot，worker 就只會載入 yt_worker，不會再載一次 discord.py、numpy 和整個 bot。
+if __name__ == "__main__":
+    import bot
+
+    bot.bot.run(bot.TOKEN)
@@ -0,0 +1,86 @@
+import itertools
+import os
+import sys
+import threading
+
+import pytest
+
+# bot.py 在 import 時就會檢查這些環境變數；測試用假的值，也不開 SQLite 落地
+os.environ.setdefault("DISCORD_TOKEN", "test-token")
+os.environ.setdefault("CHANNEL_ID", "1")
+os.environ.setdefault("SLEEP_CHANNEL_ID", "2")
+os.environ.setdefault("CRYPTO_ALERT_CHANNEL_ID", "3")
+os.environ["STATE_PERSIST_ENABLED"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeBot:
+    # 取代 bot.py 裡的 discord Bot：背景迴圈只會用到這兩個方法
+    def __init__(self):
+        self.closed = False
+
+    async def wait_until_ready(self):
+        return None
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+
+@pytest.fixture
+def fake_bot(monkeypatch):
+    import bot as botmod
+
+    fake = FakeBot()
+    monkeypatch.setattr(botmod, "bot", fake)
+    return fake
+
+
+class FakeVoiceClient:
+    # 假的語音連線：play() 在另一個執行緒「播放」play_seconds 秒（或被 stop）後呼叫 after，跟 discord.py 一樣
+    def __init__(self, play_seconds: float = 0.0):
+        self.play_seconds = play_seconds
+        self.played: list[object] = []
+        self._stop = threading.Event()
+        self._playing = False
+        self.disconnected = False
+
+    def is_playing(self) -> bool:
+        return self._playing
+
+    def play(self, source, after):
+        self.played.append(source)
+        self._playing = True
+        self._stop.clear()
+
+        def run():
+            self._stop.wait(self.play_seconds)
+            self._playing = False
+            after(None)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    async def disconnect(self, *, force: bool = False):
+        self.stop()
+        self.disconnected = True
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, voice_client: FakeVoiceClient):
+        self.id = guild_id
+        self.voice_client = voice_client
+
+
+class FakeChannel:
+    # 發送排程以頻道 id 分開限速，每個假頻道都要有自己的 id
+    _ids = itertools.count(1000)
+
+    def __init__(self):
+        self.id = next(self._ids)
+        self.sent: list[str] = []
+
+    async def send(self, content, **kwargs):
+        self.sent.append(content)
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import shutil
+import subprocess
+
+import pytest
+
+import bot as botmod
+
+
+def test_load_only_removes_its_own_stale_files(tmp_path):
+    # 快取目錄可能跟別的東西共用（例如 /tmp 裡的 yt_cookies.txt）
+    kept = {"yt_cookies.txt", "notes.md", "readme", "index.json"}
+    stale = {"dQw4w9WgXcQ.webm", "abcdefghijk.m4a.part", "index.json.tmp"}
+    for name in kept | stale | {"AAAAAAAAAAA.webm"}:
+        (tmp_path / name).write_bytes(b"x" * 10)
+    (tmp_path / "index.json").write_text(
+        json.dumps([["AAAAAAAAAAA", {"file": "AAAAAAAAAAA.webm", "size": 0, "acodec": "opus", "title": "t"}]])
+    )
+
+    cache = botmod.AudioDiskCache(str(tmp_path), 1 << 20, 1 << 20)
+    cache.load()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(kept | {"AAAAAAAAAAA.webm"})
+    assert list(cache.entries) == ["AAAAAAAAAAA"]
+    assert cache.total_bytes == 10
+
+
+def test_only_fully_played_tracks_are_stored(tmp_path):
+    cache = botmod.AudioDiskCache(str(tmp_path), 1 << 20, 1 << 20)
+    done = {"video_id": "AAAAAAAAAAA", "title": "done", "duration": 30, "abr": 128}
+    skipped = {"video_id": "BBBBBBBBBBB", "title": "skipped", "duration": 30, "abr": 128}
+
+    async def scenario():
+        for info in (done, skipped):
+            part = cache.begin_store(info)
+            assert part == str(tmp_path / f"{info['video_id']}.mka.part")
+            (tmp_path / f"{info['video_id']}.mka.part").write_bytes(b"x" * 100)
+        # 同一首正在寫的時候，別的伺服器再播不會再寫一份
+        assert cache.begin_store(done) is None
+
+        await cache.finish_store(done, True)
+        await cache.finish_store(skipped, False)
+
+    asyncio.run(scenario())
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["AAAAAAAAAAA.mka", "index.json"]
+    assert cache.entries == {"AAAAAAAAAAA": {"file": "AAAAAAAAAAA.mka", "size": 100, "acodec": "opus", "title": "done"}}
+    assert cache.begin_store(done) is None
+
+
+def test_live_and_oversized_tracks_are_not_stored(tmp_path):
+    cache = botmod.AudioDiskCache(str(tmp_path), 1 << 20, 1 << 20)
+
+    assert cache.begin_store({"video_id": "AAAAAAAAAAA", "duration": None}) is None
+    # 128 kbps 約 16 KB/s，一小時遠超過 1 MB 上限
+    assert cache.begin_store({"video_id": "BBBBBBBBBBB", "duration": 3600, "abr": 128}) is None
+    assert cache.skipped == 2
+    assert cache._writing == {}
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_playback_ffmpeg_writes_the_same_opus_into_the_cache(tmp_path):
+    sample = tmp_path / "sample.webm"
+    subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000:duration=5",
+            "-ac", "2", "-c:a", "libopus", str(sample),
+        ],
+        check=True,
+    )
+    part = tmp_path / "AAAAAAAAAAA.mka.part"
+
+    def read_all(source):
+        frames = 0
+        while source.read():
+            frames += 1
+        source.cleanup()
+        return frames
+
+    async def scenario():
+        played = read_all(await botmod.build_audio_source(str(sample), "opus", cache_path=str(part), options="-vn"))
+        plain = read_all(await botmod.build_audio_source(str(sample), "opus", options="-vn"))
+        cached = read_all(await botmod.build_audio_source(str(part), "opus"))
+        return played, plain, cached
+
+    played, plain, cached = asyncio.run(scenario())
+
+    # 加了快取輸出，送給 Discord 的內容不變；快取檔本身也能完整播放
+    assert played == plain
+    assert abs(cached - plain) <= 1
@@ -0,0 +1,41 @@
+import asyncio
+import os
+import time
+
+import bot as botmod
+
+
+def test_timeout_kills_the_hung_worker_and_keeps_queued_jobs(monkeypatch):
+    monkeypatch.setattr(botmod, "ensure_cookies_file", lambda: None)
+    # 一個 worker、兩個名額：第二個工作排在卡住的工作後面
+    service = botmod.ExtractionService(1, 50, 3.0, 2)
+
+    async def scenario():
+        await service.warm_up()
+        old_pool = service._pool
+        old_workers = list(old_pool._processes.values())
+        old_manager = old_pool._executor_manager_thread
+
+        hung = asyncio.create_task(service._run(time.sleep, 60))
+        await asyncio.sleep(0.5)
+        queued = asyncio.create_task(service._run(os.getpid))
+
+        results = await asyncio.gather(hung, queued, return_exceptions=True)
+        return old_pool, old_workers, old_manager, results
+
+    try:
+        old_pool, old_workers, old_manager, (hung, queued) = asyncio.run(scenario())
+        for process in old_workers:
+            process.join(5)
+        old_manager.join(5)
+    finally:
+        service.close()
+
+    assert isinstance(hung, RuntimeError) and "逾時" in str(hung)
+    # 排隊的工作沒有被取消，而是換到新的 pool 跑完
+    assert isinstance(queued, int) and queued not in {p.pid for p in old_workers}
+    assert service._pool is not old_pool
+    assert service.restarts == 1 and service.timeouts == 1 and service.failures == 0
+    # 卡住的 worker 和舊 pool 的管理執行緒都結束了，不會每次逾時就漏一組
+    assert not any(process.is_alive() for process in old_workers)
+    assert not old_manager.is_alive()
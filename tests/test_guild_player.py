@@ -0,0 +1,253 @@
+import asyncio
+import time
+
+import pytest
+
+import bot as botmod
+from conftest import FakeChannel, FakeGuild, FakeVoiceClient
+
+
+@pytest.fixture
+def music(monkeypatch, fake_bot):
+    # 解析與 FFmpeg 都換成假的；解析快取用真的，才看得到失效後重新解析
+    extractions: list[str] = []
+
+    async def fake_extract(url):
+        extractions.append(url)
+        await asyncio.sleep(0.001)
+        return {"title": url, "stream_url": f"https://media.example/{url}/{len(extractions)}", "duration": 200}
+
+    async def fake_source(location, codec=None, **kwargs):
+        return location
+
+    monkeypatch.setattr(botmod, "extract_stream_info", fake_extract)
+    monkeypatch.setattr(botmod, "build_audio_source", fake_source)
+    monkeypatch.setattr(botmod, "stream_info_cache", botmod.StreamInfoCache(64))
+    monkeypatch.setattr(botmod, "music_players", {})
+    monkeypatch.setattr(botmod, "audio_cache", None)
+    monkeypatch.setattr(botmod, "outbound", botmod.OutboundScheduler())
+    return extractions
+
+
+async def wait_until_done(players, timeout: float = 5.0):
+    loop = asyncio.get_running_loop()
+    end = loop.time() + timeout
+    while any(p.is_playing or p.queue for p in players):
+        assert loop.time() < end, "players did not finish"
+        await asyncio.sleep(0.005)
+
+
+def new_player(guild_id: int, voice: FakeVoiceClient) -> botmod.GuildPlayer:
+    player = botmod.get_player(FakeGuild(guild_id, voice))
+    player.touch(FakeChannel())
+    return player
+
+
+def test_stream_that_dies_immediately_is_re_extracted_once(fake_bot, music):
+    async def scenario():
+        fake_bot.loop = asyncio.get_running_loop()
+        voice = FakeVoiceClient(play_seconds=0)
+        player = new_player(1, voice)
+        player.enqueue({"type": "yt", "url": "song"})
+        await player.play_next()
+        await wait_until_done([player])
+        await asyncio.sleep(0.01)
+        return voice, player.channel
+
+    voice, channel = asyncio.run(scenario())
+
+    # 第一次的網址馬上結束 → 丟掉快取重新解析一次；第二次還是一樣就放棄，不無限重試
+    assert music == ["song", "song"]
+    assert voice.played == ["https://media.example/song/1", "https://media.example/song/2"]
+    assert botmod.stream_info_cache.invalidated == 1
+    # 播放通知經過發送排程
+    assert channel.sent == ["▶ 正在播放：**song**", "▶ 正在播放：**song**"]
+    assert botmod.outbound.sent[botmod.PRIORITY_NORMAL] == 2
+
+
+def test_skip_is_not_treated_as_a_dead_stream(fake_bot, music):
+    async def scenario():
+        fake_bot.loop = asyncio.get_running_loop()
+        voice = FakeVoiceClient(play_seconds=10)
+        player = new_player(1, voice)
+        player.enqueue({"type": "yt", "url": "a"}, {"type": "yt", "url": "b"})
+        await player.play_next()
+        await asyncio.sleep(0.05)
+        player.skip()
+        await asyncio.sleep(0.05)
+        player.clear()
+        voice.stop()
+        await wait_until_done([player])
+        return voice
+
+    voice = asyncio.run(scenario())
+
+    assert voice.played == ["https://media.example/a/1", "https://media.example/b/2"]
+    assert music == ["a", "b"]
+    assert botmod.stream_info_cache.invalidated == 0
+
+
+def test_cleared_prefetches_are_never_extracted(monkeypatch, fake_bot, music):
+    started: list[str] = []
+    finished: list[str] = []
+
+    async def slow_extract(url):
+        started.append(url)
+        await asyncio.sleep(0.1)
+        finished.append(url)
+        return {"title": url, "stream_url": f"https://media.example/{url}", "duration": 200}
+
+    monkeypatch.setattr(botmod, "extract_stream_info", slow_extract)
+
+    async def scenario():
+        fake_bot.loop = asyncio.get_running_loop()
+        voice = FakeVoiceClient(play_seconds=10)
+        player = new_player(1, voice)
+        player.enqueue({"type": "yt", "url": "a"})
+        await player.play_next()
+        player.enqueue({"type": "yt", "url": "b"}, {"type": "yt", "url": "c"})
+        await asyncio.sleep(0.02)
+
+        # !stop：佇列裡正在預先解析的 b、c 要真的停掉，不能在背景跑完
+        player.clear()
+        voice.stop()
+        await asyncio.sleep(0.2)
+        assert botmod.stream_info_cache._inflight == {}
+
+        # 清掉之後馬上點新歌，不用排在被取消的解析後面
+        player.enqueue({"type": "yt", "url": "d"})
+        await player.play_next()
+        player.clear()
+        voice.stop()
+        await asyncio.sleep(0.05)
+        return voice
+
+    voice = asyncio.run(scenario())
+
+    assert started == ["a", "b", "c", "d"]
+    assert finished == ["a", "d"]
+    assert sorted(botmod.stream_info_cache.entries) == ["a", "d"]
+    assert voice.played == ["https://media.example/a", "https://media.example/d"]
+
+
+def test_first_play_fills_the_audio_cache_from_the_same_stream(monkeypatch, tmp_path, fake_bot, music):
+    monkeypatch.setattr(botmod, "audio_cache", botmod.AudioDiskCache(str(tmp_path), 1 << 20, 1 << 20))
+    sources: list[tuple[str, str | None]] = []
+
+    async def extract(url):
+        music.append(url)
+        video_id = {"full": "AAAAAAAAAAA", "skipped": "BBBBBBBBBBB"}[url]
+        return {"title": url, "stream_url": f"https://media.example/{url}", "video_id": video_id, "duration": 1}
+
+    async def source(location, codec=None, cache_path=None, **kwargs):
+        # 假的 FFmpeg：播放的同時把內容寫進快取檔
+        sources.append((location, cache_path))
+        if cache_path is not None:
+            with open(cache_path, "wb") as f:
+                f.write(b"opus" * 10)
+        return location
+
+    monkeypatch.setattr(botmod, "extract_stream_info", extract)
+    monkeypatch.setattr(botmod, "build_audio_source", source)
+
+    async def scenario():
+        fake_bot.loop = asyncio.get_running_loop()
+        voice = FakeVoiceClient(play_seconds=0.01)
+        player = new_player(1, voice)
+        player.enqueue({"type": "yt", "url": "full"})
+        await player.play_next()
+        await wait_until_done([player])
+        await asyncio.sleep(0.02)
+
+        # 第二次從本機檔案播，不再解析也不再抓串流
+        player.enqueue({"type": "yt", "url": "https://youtu.be/AAAAAAAAAAA"})
+        await player.play_next()
+        await wait_until_done([player])
+
+        # 被 !skip 掉的只寫了一半，不收進快取
+        voice.play_seconds = 10
+        player.enqueue({"type": "yt", "url": "skipped"})
+        await player.play_next()
+        await asyncio.sleep(0.02)
+        player.skip()
+        await wait_until_done([player])
+        await asyncio.sleep(0.02)
+
+    asyncio.run(scenario())
+
+    cached_path = str(tmp_path / "AAAAAAAAAAA.mka")
+    assert sources == [
+        ("https://media.example/full", str(tmp_path / "AAAAAAAAAAA.mka.part")),
+        (cached_path, None),
+        ("https://media.example/skipped", str(tmp_path / "BBBBBBBBBBB.mka.part")),
+    ]
+    assert music == ["full", "skipped"]
+    assert list(botmod.audio_cache.entries) == ["AAAAAAAAAAA"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["AAAAAAAAAAA.mka", "index.json"]
+
+
+def test_many_guilds_play_their_own_queues(monkeypatch, fake_bot, music):
+    # 影片很短、馬上播完，不要被當成串流失效
+    monkeypatch.setattr(botmod, "YT_EARLY_END_SECONDS", 0)
+    guilds, tracks = 30, 6
+    # 快取放得下所有伺服器預先解析的曲目，每首就只會解析一次
+    monkeypatch.setattr(botmod, "stream_info_cache", botmod.StreamInfoCache(guilds * tracks))
+
+    async def scenario():
+        fake_bot.loop = asyncio.get_running_loop()
+        voices = {gid: FakeVoiceClient(play_seconds=0.01) for gid in range(guilds)}
+        players = {gid: new_player(gid, voice) for gid, voice in voices.items()}
+        for gid, player in players.items():
+            player.enqueue(*({"type": "yt", "url": f"g{gid}-t{n}"} for n in range(tracks)))
+        await asyncio.gather(*(p.play_next() for p in players.values()))
+        await wait_until_done(players.values(), timeout=20)
+        return voices
+
+    voices = asyncio.run(scenario())
+
+    assert len(botmod.music_players) == guilds
+    for gid, voice in voices.items():
+        # 每個伺服器照順序播完自己的清單，沒有混到別人的
+        assert [url.split("/")[3] for url in voice.played] == [f"g{gid}-t{n}" for n in range(tracks)]
+    assert len(music) == guilds * tracks
+    assert botmod.stream_info_cache.invalidated == 0
+
+
+def test_clear_and_idle_eviction_only_touch_their_own_guild(monkeypatch, fake_bot, music):
+    monkeypatch.setattr(botmod, "YT_EARLY_END_SECONDS", 0)
+
+    async def scenario():
+        fake_bot.loop = asyncio.get_running_loop()
+        voices = {gid: FakeVoiceClient(play_seconds=10) for gid in (1, 2, 3)}
+        players = {gid: new_player(gid, voice) for gid, voice in voices.items()}
+        for gid, player in players.items():
+            player.enqueue(*({"type": "yt", "url": f"g{gid}-t{n}"} for n in range(3)))
+            await player.play_next()
+
+        # 伺服器 1 !stop：只清掉自己的佇列
+        players[1].clear()
+        voices[1].stop()
+        await asyncio.sleep(0.05)
+        assert not players[1].is_playing and not players[1].queue
+        assert players[2].is_playing and len(players[2].queue) == 2
+        assert players[3].is_playing and len(players[3].queue) == 2
+
+        # 只有沒在播放的伺服器 1 被釋放，播放中的 2、3 就算很久沒下指令也留著
+        monkeypatch.setattr(botmod, "MUSIC_IDLE_TIMEOUT_SECONDS", 0)
+        evicted = botmod.evict_idle_players(time.monotonic() + 1)
+        assert evicted == [1]
+        assert sorted(botmod.music_players) == [2, 3]
+
+        for gid in (2, 3):
+            players[gid].clear()
+            voices[gid].stop()
+        await asyncio.sleep(0.05)
+        assert sorted(botmod.evict_idle_players(time.monotonic() + 1)) == [2, 3]
+        return voices
+
+    voices = asyncio.run(scenario())
+
+    assert botmod.music_players == {}
+    # 釋放的只是播放器，bot 還是留在語音頻道裡
+    assert not any(voice.disconnected for voice in voices.values())
+    assert [len(voice.played) for voice in voices.values()] == [1, 1, 1]
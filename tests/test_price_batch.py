@@ -0,0 +1,55 @@
+import asyncio
+import datetime
+
+import pytest
+
+import bot as botmod
+
+
+class RecordingStore:
+    def __init__(self):
+        self.marked: list[tuple[str, ...]] = []
+
+    def mark_dirty(self, *names: str):
+        self.marked.append(names)
+
+    def alert_removed(self, symbol: str, price: float):
+        pass
+
+
+@pytest.fixture
+def store(monkeypatch):
+    async def submit(channel, alerts):
+        return None
+
+    store = RecordingStore()
+    monkeypatch.setattr(botmod, "state_store", store)
+    monkeypatch.setattr(botmod.alert_dispatcher, "submit", submit)
+    return store
+
+
+def run_ticks(ticks: list[dict[str, float]]):
+    async def scenario():
+        start = datetime.datetime(2026, 1, 1, tzinfo=botmod.TZ)
+        for k, prices in enumerate(ticks):
+            await botmod.process_price_batch(None, start + datetime.timedelta(seconds=k), prices)
+
+    asyncio.run(scenario())
+
+
+def test_unchanged_prices_do_not_mark_state_dirty(store):
+    symbol = botmod.CRYPTO_SYMBOLS[0]
+    price = 12345.0
+    run_ticks([{symbol: price}] * 5)
+
+    # 第一輪記下價格與價位區間，之後價格沒變就不再排寫入
+    assert store.marked[0] and "last_seen_prices" in store.marked[0]
+    assert len(store.marked) == 1
+
+
+def test_price_move_marks_only_what_changed(store):
+    symbol = botmod.CRYPTO_SYMBOLS[0]
+    step = botmod.watch_state.breakout_steps[botmod.watch_state.index[symbol]]
+    run_ticks([{symbol: 50_000.0}, {symbol: 50_000.0 + step / 1000}])
+
+    assert store.marked[-1] == ("last_seen_prices",)
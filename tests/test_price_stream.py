@@ -0,0 +1,180 @@
+import asyncio
+import json
+
+import aiohttp
+from aiohttp import web
+
+import bot as botmod
+
+
+def make_stream(pairs: int = 3, max_evals_per_second: float = 20):
+    symbol_map = {f"C{i}": f"C{i}USDT" for i in range(pairs)}
+    return botmod.BinancePriceStream(symbol_map, "miniTicker", max_evals_per_second)
+
+
+class StandInServer:
+    # 假的 Binance combined stream：記下收到的 SUBSCRIBE，送幾筆報價後關掉連線
+    def __init__(self, ticks: list[dict]):
+        self.ticks = ticks
+        self.connections = 0
+        self.subscribes: list[dict] = []
+        self.runner: web.AppRunner | None = None
+        self.url = ""
+
+    async def handler(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+
+        msg = await ws.receive()
+        self.subscribes.append(json.loads(msg.data))
+        for tick in self.ticks:
+            await ws.send_str(json.dumps({"stream": "x", "data": tick}))
+        await ws.close()
+        return ws
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/stream", self.handler)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/stream"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def test_parse_message_combined_and_raw():
+    stream = make_stream()
+    assert stream.parse_message(json.dumps({"stream": "c0usdt@miniTicker", "data": {"s": "C0USDT", "c": "1.25"}})) == ("C0", 1.25)
+    assert stream.parse_message(json.dumps({"s": "C1USDT", "p": "2"})) == ("C1", 2.0)
+
+
+def test_parse_message_rejects_garbage_and_unknown_pairs():
+    stream = make_stream()
+    assert stream.parse_message("not json") is None
+    assert stream.parse_message(json.dumps({"result": None, "id": 1})) is None
+    assert stream.parse_message(json.dumps({"data": {"s": "ZZZUSDT", "c": "1"}})) is None
+    assert stream.parse_message(json.dumps({"data": {"s": "C0USDT", "c": "abc"}})) is None
+
+
+def test_subscribe_is_chunked(monkeypatch):
+    stream = make_stream(pairs=450)
+    sent = []
+
+    class FakeWs:
+        async def send_json(self, payload):
+            sent.append(payload)
+
+    async def no_sleep(_):
+        return None
+
+    monkeypatch.setattr(botmod.asyncio, "sleep", no_sleep)
+    asyncio.run(stream._subscribe(FakeWs()))
+
+    assert [len(p["params"]) for p in sent] == [200, 200, 50]
+    assert [p["id"] for p in sent] == [1, 2, 3]
+    assert all(p["method"] == "SUBSCRIBE" for p in sent)
+    assert sum((p["params"] for p in sent), []) == stream.stream_names()
+
+
+def test_run_consumes_stand_in_server_and_reconnects(monkeypatch, fake_bot):
+    monkeypatch.setattr(botmod.random, "uniform", lambda a, b: 0.01)
+    stream = make_stream()
+
+    async def scenario():
+        server = StandInServer([{"s": "C0USDT", "c": "10"}, {"s": "C1USDT", "c": "20"}, {"s": "C0USDT", "c": "11"}])
+        await server.start()
+        monkeypatch.setattr(botmod, "BINANCE_WS_URL", server.url)
+        # 評估迴圈不在這個測試範圍內，報價留在 _pending 裡檢查
+        monkeypatch.setattr(stream, "_evaluate_loop", lambda: asyncio.sleep(0))
+
+        task = asyncio.create_task(stream.run())
+        try:
+            for _ in range(200):
+                if server.connections >= 3:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            fake_bot.closed = True
+            await asyncio.wait_for(task, 2)
+            await botmod.http_client.close()
+            await server.stop()
+        return server
+
+    server = asyncio.run(scenario())
+
+    assert server.connections >= 3
+    assert stream.reconnects >= 2
+    assert server.subscribes[0]["params"] == stream.stream_names()
+    # 同一個幣種只留最後一筆
+    assert stream._pending == {"C0": 11.0, "C1": 20.0}
+    assert stream.messages >= 3
+    assert not stream.connected
+
+
+def test_backoff_doubles_on_failed_connects_and_caps(monkeypatch, fake_bot):
+    monkeypatch.setattr(botmod.random, "uniform", lambda a, b: 0.001)
+    monkeypatch.setattr(botmod, "CRYPTO_STREAM_BACKOFF_MAX_SECONDS", 8)
+    stream = make_stream()
+
+    attempts = []
+
+    def refused(url, **kwargs):
+        attempts.append(url)
+        raise aiohttp.ClientConnectionError("refused")
+
+    monkeypatch.setattr(botmod.http_client, "ws_connect", refused)
+
+    async def scenario():
+        monkeypatch.setattr(stream, "_evaluate_loop", lambda: asyncio.sleep(0))
+        task = asyncio.create_task(stream.run())
+        while len(attempts) < 6:
+            await asyncio.sleep(0.001)
+        fake_bot.closed = True
+        await asyncio.wait_for(task, 2)
+
+    asyncio.run(scenario())
+
+    # 1 → 2 → 4 → 8 → 8（上限）
+    assert stream.backoff == 8
+    assert stream.reconnects >= 6
+
+
+def test_evaluate_loop_throttles_and_coalesces(monkeypatch, fake_bot):
+    stream = make_stream(pairs=3, max_evals_per_second=20)
+    batches = []
+
+    async def fake_channel():
+        return object()
+
+    async def fake_process(channel, now, prices):
+        batches.append(prices)
+
+    monkeypatch.setattr(botmod, "get_crypto_alert_channel", fake_channel)
+    monkeypatch.setattr(botmod, "process_price_batch", fake_process)
+
+    async def scenario():
+        task = asyncio.create_task(stream._evaluate_loop())
+        loop = asyncio.get_running_loop()
+        end = loop.time() + 0.5
+        n = 0
+        while loop.time() < end:
+            n += 1
+            stream._pending[f"C{n % 3}"] = float(n)
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.1)
+        fake_bot.closed = True
+        await asyncio.wait_for(task, 1)
+        return n
+
+    ticks = asyncio.run(scenario())
+
+    # 0.5 秒、每秒最多 20 輪 → 大約 10 輪，遠少於收到的報價數
+    assert 5 <= len(batches) <= 13
+    assert ticks > 5 * len(batches)
+    assert stream.evaluations == len(batches)
+    assert all(len(batch) <= 3 for batch in batches)
@@ -0,0 +1,41 @@
+import datetime
+
+import bot as botmod
+
+NOW = datetime.datetime(2026, 3, 1, 12, 0, tzinfo=datetime.timezone.utc)
+
+
+def rss(*ages_hours: float) -> bytes:
+    items = "".join(
+        f"<item><title>News {i}</title><link>https://example.com/{i}</link>"
+        f"<pubDate>{(NOW - datetime.timedelta(hours=h)).strftime('%a, %d %b %Y %H:%M:%S +0000')}</pubDate></item>"
+        for i, h in enumerate(ages_hours)
+    )
+    return f"<rss><channel>{items}</channel></rss>".encode()
+
+
+def parse(data: bytes, chunk: int = 64) -> botmod.RssStreamParser:
+    parser = botmod.RssStreamParser(NOW - datetime.timedelta(hours=24))
+    for i in range(0, len(data), chunk):
+        parser.feed(data[i:i + chunk])
+        if parser.done:
+            break
+    parser.close()
+    return parser
+
+
+def test_keeps_recent_items_and_stops_after_old_streak():
+    parser = parse(rss(1, 2, 30, 31, 32, 3))
+    assert [a["title"] for a in parser.articles] == ["News 0", "News 1"]
+    assert parser.done and not parser.failed
+
+
+def test_feed_without_recent_items_is_not_a_failure():
+    parser = parse(rss(30, 40, 50))
+    assert parser.articles == []
+    assert not parser.failed
+
+
+def test_broken_xml_is_a_failure():
+    assert parse(b"<rss><channel><item><title>x</title></oops>").failed
+    assert parse(rss(1)[:-20]).failed
@@ -0,0 +1,129 @@
+import random
+
+import numpy as np
+
+import bot as botmod
+
+
+def brute_force_aggregate(rows: list[tuple[float, np.ndarray]], now: float, window: botmod.RollingWindow):
+    # 跟 RollingWindow 一樣以格子為單位淘汰：格子結束時間 <= now - seconds 就不算
+    slot = window.slot_seconds
+    kept = [row for ts, row in rows if (ts - ts % slot) + slot > now - window.seconds]
+    data = np.array(kept)
+
+    first, last, high, low, drawdown = [], [], [], [], []
+    for col in data.T:
+        valid = col[~np.isnan(col)]
+        if not len(valid):
+            for values in (first, last, high, low, drawdown):
+                values.append(np.nan)
+            continue
+        first.append(valid[0])
+        last.append(valid[-1])
+        high.append(valid.max())
+        low.append(valid.min())
+        running_max = np.maximum.accumulate(valid)
+        drawdown.append(((running_max - valid) / running_max).max())
+    return tuple(np.array(x) for x in (first, last, high, low, drawdown))
+
+
+def test_rolling_window_matches_brute_force():
+    rng = random.Random(7)
+    window = botmod.RollingWindow(600, slots=60)
+    rows = []
+    prices = np.array([100.0, 50.0, np.nan])
+    ts = 1_700_000_000.0
+
+    for step in range(1500):
+        ts += rng.choice([1, 2, 3, 7, 15])
+        prices = prices * np.array([rng.uniform(0.98, 1.02) for _ in range(3)])
+        if step == 40:
+            # 第三個幣種中途才開始有報價
+            prices[2] = 10.0
+        row = prices.copy()
+        if step % 13 == 0:
+            row[1] = np.nan
+        rows.append((ts, row))
+        window.push(ts, row)
+
+        if step % 25 == 0:
+            got = window.aggregate()
+            expected = brute_force_aggregate(rows, ts, window)
+            for g, e in zip(got, expected):
+                np.testing.assert_allclose(g, e, equal_nan=True)
+
+
+def test_rolling_window_drops_everything_after_a_long_gap():
+    window = botmod.RollingWindow(60, slots=6)
+    window.push(0.0, np.array([100.0]))
+    window.push(5.0, np.array([50.0]))
+    window.push(1000.0, np.array([80.0]))
+
+    first, last, high, low, drawdown = window.aggregate()
+    assert first[0] == last[0] == high[0] == low[0] == 80.0
+    assert drawdown[0] == 0.0
+
+
+def make_index(*prices: float) -> botmod.PriceAlertIndex:
+    index = botmod.PriceAlertIndex()
+    for price in prices:
+        assert index.add({"price": price})
+    return index
+
+
+def test_price_alert_index_pop_crossed_upward_is_exclusive_of_prev():
+    index = make_index(100.0, 105.0, 110.0, 120.0)
+    fired = index.pop_crossed(100.0, 110.0)
+    assert [a["price"] for a in fired] == [105.0, 110.0]
+    assert [a["price"] for a in index] == [100.0, 120.0]
+
+
+def test_price_alert_index_pop_crossed_downward():
+    index = make_index(90.0, 95.0, 100.0, 120.0)
+    fired = index.pop_crossed(100.0, 90.0)
+    assert [a["price"] for a in fired] == [90.0, 95.0]
+    assert [a["price"] for a in index] == [100.0, 120.0]
+
+
+def test_price_alert_index_pop_crossed_no_move_or_no_targets():
+    index = make_index(100.0)
+    assert index.pop_crossed(100.0, 100.0) == []
+    assert index.pop_crossed(101.0, 150.0) == []
+    assert len(index) == 1
+
+
+def test_price_alert_index_rejects_duplicates_and_removes():
+    index = make_index(100.0)
+    assert not index.add({"price": 100.0 + botmod.PRICE_ALERT_EPSILON / 2})
+    assert index.remove(100.0)["price"] == 100.0
+    assert index.remove(100.0) is None
+
+
+def test_alert_batch_render_puts_mentions_first_and_never_mentions_others():
+    batch = botmod.AlertBatch()
+    batch.add("a")
+    batch.add("urgent", mention_everyone=True)
+    batch.add("b")
+
+    assert batch.render() == [("@everyone urgent", True), ("a\n\nb", False)]
+
+
+def test_alert_batch_render_splits_at_limit_and_truncates_huge_items():
+    batch = botmod.AlertBatch()
+    for i in range(5):
+        batch.add(f"{i}" * 40)
+    batch.add("x" * 500)
+
+    messages = batch.render(limit=100)
+    assert all(len(text) <= 100 for text, _ in messages)
+    # 兩則 40 字 + 分隔 = 82，第三則放不下就換下一則
+    assert [text for text, _ in messages[:3]] == [
+        "0" * 40 + "\n\n" + "1" * 40,
+        "2" * 40 + "\n\n" + "3" * 40,
+        "4" * 40,
+    ]
+    assert messages[-1] == ("x" * 100, False)
+
+
+def test_alert_batch_render_empty():
+    assert botmod.AlertBatch().render() == []
@@ -0,0 +1,44 @@
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+
+import yt_worker
+
+
+class FakePlaylistIE(InfoExtractor):
+    # 假的播放清單：每首都是從產生器逐一拿出來的，跟 YouTube 分頁抓清單一樣
+    _VALID_URL = r"fakeplaylist:(?P<id>\w+)"
+    pulled = 0
+
+    def _real_extract(self, url):
+        def entries():
+            for n in range(1000):
+                FakePlaylistIE.pulled += 1
+                yield {"_type": "url", "id": f"vid{n:08d}", "title": f"song {n}", "url": f"fake:{n}"}
+
+        return self.playlist_result(entries(), self._match_id(url), "fake list")
+
+
+def make_flat_ydl():
+    ydl = yt_dlp.YoutubeDL({**yt_worker.FLAT_PLAYLIST_OPTIONS, "logger": None}, auto_init=False)
+    ydl.add_info_extractor(FakePlaylistIE())
+    return ydl
+
+
+def test_extract_playlist_stops_at_limit(monkeypatch):
+    monkeypatch.setattr(yt_worker, "_flat_ydl", make_flat_ydl())
+    FakePlaylistIE.pulled = 0
+
+    result = yt_worker.extract_playlist("fakeplaylist:abc", 5)
+
+    assert result["title"] == "fake list"
+    assert [e["title"] for e in result["entries"]] == [f"song {n}" for n in range(5)]
+    assert result["entries"][0]["url"] == "https://www.youtube.com/watch?v=vid00000000"
+    # 清單有 1000 首，yt-dlp 只拿了前面幾首就停
+    assert FakePlaylistIE.pulled <= 6
+
+
+def test_playlist_limit_is_set_per_call(monkeypatch):
+    monkeypatch.setattr(yt_worker, "_flat_ydl", make_flat_ydl())
+
+    assert len(yt_worker.extract_playlist("fakeplaylist:abc", 3)["entries"]) == 3
+    assert len(yt_worker.extract_playlist("fakeplaylist:abc", 8)["entries"]) == 8
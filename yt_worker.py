@@ -0,0 +1,100 @@
+# yt-dlp 解析 worker：跑在獨立的子行程裡，yt-dlp 解析時就不會卡住 bot 的 event loop
+# 子行程只 import 這個模組（加上 __main__ 腳本，所以要用 main.py 啟動），這裡不能有任何 import 時的副作用
+import os
+
+import yt_dlp
+
+YDL_OPTIONS = {
+    "format": "bestaudio/best",
+    "noplaylist": True,
+    "quiet": True,
+    "nocheckcertificate": True,
+    "cachedir": False,
+    "force_ipv4": True,
+    "socket_timeout": 15,
+    "retries": 1,
+    "extractor_args": {
+        "youtube": {
+            "player_client": ["ios", "default"],
+        }
+    },
+    "http_headers": {
+        "User-Agent": (
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+            "AppleWebKit/537.36 (KHTML, like Gecko) "
+            "Chrome/124.0.0.0 Safari/537.36"
+        )
+    },
+}
+
+# 播放清單只抓 ID 和標題（不解析每首的串流），很便宜
+FLAT_PLAYLIST_OPTIONS = {
+    **YDL_OPTIONS,
+    "noplaylist": False,
+    "extract_flat": "in_playlist",
+}
+
+# 每個 worker 只建一次，之後的解析都重用（extractor、player JS 等都留在記憶體）
+_ydl = None
+_flat_ydl = None
+
+
+def init_worker(cookies_path):
+    global _ydl, _flat_ydl
+
+    extra = {}
+    if cookies_path:
+        extra["cookiefile"] = cookies_path
+    else:
+        print("[yt-worker] WARNING: cookiefile not available -> likely to get 'not a bot' error", flush=True)
+
+    _ydl = yt_dlp.YoutubeDL({**YDL_OPTIONS, **extra})
+    _flat_ydl = yt_dlp.YoutubeDL({**FLAT_PLAYLIST_OPTIONS, **extra})
+    print(f"[yt-worker] ready (pid={os.getpid()})", flush=True)
+
+
+def ping():
+    return os.getpid()
+
+
+def extract(url):
+    try:
+        info = _ydl.extract_info(url, download=False)
+    except Exception as e:
+        # yt-dlp 的例外帶著 logger 等物件，傳不回主行程，只保留訊息
+        raise RuntimeError(str(e)) from None
+    if "entries" in info:
+        info = info["entries"][0]
+    return {
+        "title": info.get("title", "未知音樂"),
+        "stream_url": info["url"],
+        "video_id": info.get("id"),
+        "ext": info.get("ext"),
+        "acodec": info.get("acodec"),
+        "abr": info.get("abr"),
+        "asr": info.get("asr"),
+        "duration": info.get("duration"),
+    }
+
+
+def extract_playlist(url, limit):
+    # 讓 yt-dlp 抓到第 limit 首就停，不用把整份清單的分頁都抓完再截斷
+    # worker 一次只跑一個工作，直接改這個 YoutubeDL 的參數就好
+    _flat_ydl.params["playlistend"] = limit
+    try:
+        info = _flat_ydl.extract_info(url, download=False)
+    except Exception as e:
+        raise RuntimeError(str(e)) from None
+
+    entries = []
+    for entry in info.get("entries") or []:
+        if len(entries) >= limit:
+            break
+        if not entry:
+            continue
+        entry_url = entry.get("url")
+        if not entry_url or not entry_url.startswith("http"):
+            entry_url = f"https://www.youtube.com/watch?v={entry['id']}"
+        entries.append({"url": entry_url, "title": entry.get("title")})
+
+    return {"title": info.get("title", "播放清單"), "entries": entries}